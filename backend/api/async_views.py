@@ -0,0 +1,257 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.http import quote_etag
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipe.models import Favorite, Recipe, ShoppingCart
+from . import views
+from .conditional import (get_instance_flags, get_instance_state,
+                          get_page_etag, is_conditional,
+                          set_recipe_validators)
+from .filters import filter_recipes
+from .ingredient_catalogue import catalogue_response
+from .ingredient_index import ingredient_index
+from .pagination import CustomPaginator, CursorPaginator, get_recipe_paginator
+from .relations import add_relation, remove_relation
+from .response_cache import (arecipe_key, arecipes_list_key, get_cache,
+                             get_cached_headers, record)
+from .serializers import ForReadRecipeSerializer, RecipeShortLinkSerializer
+
+
+def render(data, status=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(JSONRenderer().render(data), status=status,
+                            content_type='application/json',
+                            headers=headers)
+    response.data = data
+    return response
+
+
+def render_exception(exc):
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    response = render(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated,
+                        exceptions.AuthenticationFailed)):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+async def authenticate(request):
+    auth = request.headers.get('Authorization', '').split()
+    if not auth or auth[0].lower() != 'token':
+        return AnonymousUser()
+    if len(auth) == 1:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. '
+              'Token string should not contain spaces.'))
+
+    token = await (Token.objects.select_related('user')
+                   .filter(key=auth[1]).afirst())
+    if token is None:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(
+            _('User inactive or deleted.'))
+    return token.user
+
+
+def recipe_not_found():
+    return Http404(f'No {Recipe._meta.object_name} matches the given query.')
+
+
+def async_api_view(methods):
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                drf_request = Request(request)
+                drf_request.user = await authenticate(request)
+                return await handler(drf_request, *args, **kwargs)
+            except Http404 as exc:
+                return render_exception(exceptions.NotFound(*exc.args))
+            except exceptions.APIException as exc:
+                return render_exception(exc)
+        return wrapper
+    return decorator
+
+
+def cache_anonymous_response(get_key):
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return await handler(request, *args, **kwargs)
+
+            cache = get_cache()
+            key = await get_key(request, *args, **kwargs)
+            cached = await cache.aget(key)
+            if cached is not None:
+                record('hit')
+                data, headers = cached
+                response = render(data, headers=headers)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            record('miss')
+            response = await handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                await cache.aset(key, (response.data,
+                                       get_cached_headers(response)))
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+async def paginate(request, queryset):
+    paginator = CustomPaginator()
+    page_size = paginator.get_page_size(request)
+    number = request.query_params.get(paginator.page_query_param) or 1
+    last = number in paginator.last_page_strings
+    if not last:
+        try:
+            number = int(number)
+        except ValueError:
+            raise exceptions.NotFound(paginator.invalid_page_message)
+
+    count = await queryset.acount()
+    num_pages = max(1, -(-count // page_size))
+    if last:
+        number = num_pages
+    if not 1 <= number <= num_pages:
+        raise exceptions.NotFound(paginator.invalid_page_message)
+
+    page = []
+    if count:
+        offset = (number - 1) * page_size
+        page = [item async for item in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if number < num_pages:
+        next_url = replace_query_param(url, paginator.page_query_param,
+                                       number + 1)
+    if number == 2:
+        previous_url = remove_query_param(url, paginator.page_query_param)
+    elif number > 2:
+        previous_url = replace_query_param(url, paginator.page_query_param,
+                                           number - 1)
+    return page, {'count': count, 'next': next_url, 'previous': previous_url}
+
+
+@async_api_view(['GET'])
+@cache_anonymous_response(arecipes_list_key)
+async def read_recipes_list(request):
+    recipes = (Recipe.objects.with_ingredients()
+               .with_user_flags(request.user)
+               .order_by('id'))
+    recipes = filter_recipes(request, recipes)
+
+    page, envelope = await paginate(request, recipes)
+    serializer = ForReadRecipeSerializer(page, many=True,
+                                         context={'request': request})
+    response = render({**envelope, 'results': serializer.data})
+    response['ETag'] = quote_etag(get_page_etag(
+        envelope,
+        [(get_instance_state(recipe), get_instance_flags(recipe))
+         for recipe in page]))
+    return response
+
+
+@async_api_view(['GET'])
+@cache_anonymous_response(arecipe_key)
+async def read_recipe(request, id):
+    recipe = await (Recipe.objects.with_ingredients()
+                    .with_user_flags(request.user)
+                    .filter(id=id).afirst())
+    if recipe is None:
+        raise recipe_not_found()
+
+    serializer = ForReadRecipeSerializer(recipe, context={'request': request})
+    response = render(serializer.data)
+    set_recipe_validators(request, response, recipe)
+    return response
+
+
+async def toggle_relation(request, id, model, exists_message):
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+
+    if request.method == 'POST':
+        recipe = await Recipe.objects.filter(pk=id).afirst()
+        if recipe is None:
+            raise recipe_not_found()
+        if not await sync_to_async(add_relation)(
+                model, user=request.user, recipe=recipe):
+            return render({'error': exists_message},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = RecipeShortLinkSerializer(recipe,
+                                               context={'request': request})
+        return render(serializer.data, status=status.HTTP_201_CREATED)
+
+    if await sync_to_async(remove_relation)(
+            model, user=request.user, recipe_id=id):
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    if not await Recipe.objects.filter(pk=id).aexists():
+        raise recipe_not_found()
+    return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+
+
+@csrf_exempt
+async def recipes_list(request):
+    if (request.method != 'GET' or is_conditional(request)
+            or isinstance(get_recipe_paginator(Request(request)),
+                          CursorPaginator)):
+        return await sync_to_async(views.recipes_list)(request)
+    return await read_recipes_list(request)
+
+
+@csrf_exempt
+async def get_recipe(request, id):
+    if request.method != 'GET' or is_conditional(request):
+        return await sync_to_async(views.get_recipe)(request, id=id)
+    return await read_recipe(request, id)
+
+
+@csrf_exempt
+@async_api_view(['POST', 'DELETE'])
+async def shopping_cart(request, id):
+    return await toggle_relation(request, id, ShoppingCart,
+                                 'Рецепт уже добавлен в корзину')
+
+
+@csrf_exempt
+@async_api_view(['POST', 'DELETE'])
+async def add_favorite(request, id):
+    return await toggle_relation(request, id, Favorite,
+                                 'Рецепт уже добавлен в избранное')
+
+
+@csrf_exempt
+@async_api_view(['GET', 'HEAD'])
+async def ingredients_list(request):
+    name = request.query_params.get('name')
+
+    if name:
+        return render(await sync_to_async(ingredient_index.search)(name))
+
+    return await sync_to_async(catalogue_response)(request._request)
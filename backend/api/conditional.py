@@ -0,0 +1,150 @@
+import hashlib
+
+from django.utils.http import http_date, quote_etag
+
+from recipe.models import Recipe
+from users.models import User
+from .filters import filter_recipes
+from .pagination import get_recipe_paginator
+from .relations import get_relations
+
+
+SAFE_METHODS = ('GET', 'HEAD')
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+RECIPE_STATE_FIELDS = ('id', 'author_id', 'updated_at', 'author__updated_at')
+
+
+def make_etag(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def is_conditional(request):
+    return (request.method in SAFE_METHODS
+            and any(header in request.META
+                    for header in CONDITIONAL_HEADERS))
+
+
+def get_recipe_flags(request, state):
+    relations = get_relations(request)
+    return (state['id'] in relations['favorites'],
+            state['id'] in relations['shopping_cart'],
+            state['author_id'] in relations['subscriptions'])
+
+
+def get_instance_state(recipe):
+    return {'id': recipe.id, 'author_id': recipe.author_id,
+            'updated_at': recipe.updated_at,
+            'author__updated_at': recipe.author.updated_at}
+
+
+def get_instance_flags(recipe):
+    return (recipe.is_favorited, recipe.is_in_shopping_cart,
+            recipe.is_author_subscribed)
+
+
+def get_recipe_etag(state, flags):
+    return make_etag(state['updated_at'], state['author__updated_at'], flags)
+
+
+def get_page_etag(envelope, rows):
+    return make_etag(
+        tuple((key, value) for key, value in envelope.items()
+              if key != 'results'),
+        [(state['id'], state['updated_at'], state['author__updated_at'],
+          flags) for state, flags in rows])
+
+
+def get_user_etag(state, is_subscribed):
+    return make_etag(state['updated_at'], is_subscribed)
+
+
+def get_recipe_state(request, id):
+    if not hasattr(request, 'recipe_state'):
+        request.recipe_state = (Recipe.objects.filter(pk=id)
+                                .values(*RECIPE_STATE_FIELDS).first())
+    return request.recipe_state
+
+
+def get_user_state(request, id):
+    if not hasattr(request, 'user_state'):
+        request.user_state = None
+        if str(id).isdigit():
+            request.user_state = (User.objects.filter(pk=id)
+                                  .values('id', 'updated_at').first())
+    return request.user_state
+
+
+def recipe_etag(request, id):
+    if not is_conditional(request):
+        return None
+    state = get_recipe_state(request, id)
+    if state is None:
+        return None
+    return get_recipe_etag(state, get_recipe_flags(request, state))
+
+
+def recipe_last_modified(request, id):
+    if not is_conditional(request) or request.user.is_authenticated:
+        return None
+    state = get_recipe_state(request, id)
+    if state is None:
+        return None
+    return max(state['updated_at'], state['author__updated_at'])
+
+
+def recipes_list_etag(request):
+    if not is_conditional(request):
+        return None
+    queryset = filter_recipes(request, Recipe.objects.order_by('id'))
+    paginator = get_recipe_paginator(request)
+    page = paginator.paginate_queryset(
+        queryset.values(*RECIPE_STATE_FIELDS), request)
+    envelope = paginator.get_paginated_response(None).data
+    return get_page_etag(
+        envelope,
+        [(state, get_recipe_flags(request, state)) for state in page])
+
+
+def user_etag(request, id=None):
+    if not is_conditional(request):
+        return None
+    state = get_user_state(request, id)
+    if state is None:
+        return None
+    relations = get_relations(request)
+    return get_user_etag(state, state['id'] in relations['subscriptions'])
+
+
+def user_last_modified(request, id=None):
+    if not is_conditional(request) or request.user.is_authenticated:
+        return None
+    state = get_user_state(request, id)
+    return state and state['updated_at']
+
+
+def set_validators(request, response, etag, last_modified):
+    response['ETag'] = quote_etag(etag)
+    if not request.user.is_authenticated:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+
+
+def set_recipe_validators(request, response, recipe):
+    state = get_instance_state(recipe)
+    set_validators(request, response,
+                   get_recipe_etag(state, get_instance_flags(recipe)),
+                   max(state['updated_at'], state['author__updated_at']))
+
+
+def set_page_validators(request, response, recipes):
+    response['ETag'] = quote_etag(get_page_etag(
+        response.data,
+        [(get_instance_state(recipe), get_instance_flags(recipe))
+         for recipe in recipes]))
+
+
+def set_user_validators(request, response, user):
+    relations = get_relations(request)
+    set_validators(request, response,
+                   get_user_etag({'updated_at': user.updated_at},
+                                 user.id in relations['subscriptions']),
+                   user.updated_at)
@@ -0,0 +1,121 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db.models import Max
+
+from recipe.models import Recipe, RecipeIngredient
+
+
+INDEX_TTL = 60 * 60
+CHANGE_LAG = timedelta(seconds=30)
+CHANGES_LIMIT = 1000
+BUILD_CHUNK_SIZE = 10000
+MAX_MISSING = 10
+MAX_INGREDIENTS = 100
+
+
+def get_watermark():
+    return Recipe.objects.aggregate(latest=Max('updated_at'))['latest']
+
+
+def load_ingredients(queryset):
+    recipes = defaultdict(set)
+    for recipe_id, ingredient_id in (
+            queryset.values_list('recipe_id', 'ingredient_id')
+            .iterator(chunk_size=BUILD_CHUNK_SIZE)):
+        recipes[recipe_id].add(ingredient_id)
+    return recipes
+
+
+class CoverageIndex:
+    def __init__(self, ttl=INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._postings = None
+        self._recipes = None
+        self._watermark = None
+        self._built_at = 0
+
+    def build(self):
+        watermark = get_watermark()
+        recipes = load_ingredients(RecipeIngredient.objects.all())
+        postings = defaultdict(list)
+        for recipe_id, ingredients in recipes.items():
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(recipe_id)
+        postings = {
+            ingredient_id: array('I', sorted(recipe_ids))
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        recipes = {recipe_id: frozenset(ingredients)
+                   for recipe_id, ingredients in recipes.items()}
+        with self._lock:
+            self._postings, self._recipes = postings, recipes
+            self._watermark = watermark
+            self._built_at = time.monotonic()
+
+    def apply(self, recipe_ids):
+        current = load_ingredients(
+            RecipeIngredient.objects.filter(recipe_id__in=recipe_ids))
+        for recipe_id in recipe_ids:
+            old = self._recipes.pop(recipe_id, frozenset())
+            new = frozenset(current.get(recipe_id, ()))
+            for ingredient_id in old - new:
+                posting = self._postings[ingredient_id]
+                del posting[bisect_left(posting, recipe_id)]
+            for ingredient_id in new - old:
+                posting = self._postings.setdefault(ingredient_id,
+                                                    array('I'))
+                posting.insert(bisect_left(posting, recipe_id), recipe_id)
+            if new:
+                self._recipes[recipe_id] = new
+
+    def refresh(self, recipe_ids):
+        with self._lock:
+            if self._postings is not None:
+                self.apply(recipe_ids)
+
+    def sync(self):
+        watermark = get_watermark()
+        with self._lock:
+            expired = time.monotonic() - self._built_at > self.ttl
+            if self._postings is None or expired:
+                stale = True
+            elif watermark == self._watermark:
+                return
+            else:
+                recipes = Recipe.objects.all()
+                if self._watermark is not None:
+                    recipes = recipes.filter(
+                        updated_at__gte=self._watermark - CHANGE_LAG)
+                changed = set(recipes.values_list('id', flat=True)
+                              [:CHANGES_LIMIT + 1])
+                stale = len(changed) > CHANGES_LIMIT
+                if not stale:
+                    self.apply(changed)
+                    self._watermark = watermark
+        if stale:
+            self.build()
+
+    def search(self, ingredient_ids, max_missing=0):
+        self.sync()
+        with self._lock:
+            covered = Counter()
+            for ingredient_id in set(ingredient_ids):
+                covered.update(self._postings.get(ingredient_id, ()))
+            sizes = {recipe_id: len(self._recipes[recipe_id])
+                     for recipe_id in covered}
+        result = [
+            (sizes[recipe_id] - count, -count, recipe_id)
+            for recipe_id, count in covered.items()
+            if sizes[recipe_id] - count <= max_missing
+        ]
+        result.sort()
+        return [(recipe_id, missing) for missing, _, recipe_id in result]
+
+
+coverage_index = CoverageIndex()
@@ -0,0 +1,31 @@
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from recipe.models import Favorite, ShoppingCart, Subscription
+
+
+USER = 'user'
+RECIPE = 'recipe'
+MEDIA = 'media'
+RELATIONS = {
+    'favorite': (Favorite, 'recipe'),
+    'shopping_cart': (ShoppingCart, 'recipe'),
+    'subscription': (Subscription, 'author'),
+}
+USER_FIELDS = ('email', 'username', 'first_name', 'last_name', 'password',
+               'avatar', 'is_active', 'is_staff', 'is_superuser',
+               'date_joined')
+RECIPE_FIELDS = ('name', 'text', 'cooking_time')
+
+
+def open_dataset(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def dump_record(model, **fields):
+    return json.dumps({'model': model, **fields}, cls=DjangoJSONEncoder,
+                      ensure_ascii=False, separators=(',', ':')) + '\n'
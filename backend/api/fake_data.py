@@ -0,0 +1,12 @@
+DISHES = ('суп', 'салат', 'пирог', 'каша', 'запеканка', 'рагу', 'омлет',
+          'блины', 'котлеты', 'паста', 'плов', 'борщ', 'соус', 'десерт')
+STYLES = ('домашний', 'быстрый', 'постный', 'праздничный', 'летний',
+          'острый', 'сырный', 'печёный', 'тушёный', 'бабушкин')
+
+
+def fake_recipe_name(rng):
+    return f'{rng.choice(STYLES)} {rng.choice(DISHES)}'
+
+
+def fake_recipe_text(rng, words, size=8):
+    return ' '.join(rng.sample(words, min(size, len(words))))
@@ -0,0 +1,82 @@
+import binascii
+import uuid
+
+import filetype
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from .images import get_rendition_url
+
+
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+class Base64UploadedFile(TemporaryUploadedFile):
+    def __del__(self):
+        self.close()
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+
+        if not isinstance(base64_data, str):
+            raise ValidationError('Неверный тип. Ожидается строка base64')
+
+        content_type = 'application/octet-stream'
+        header, separator, payload = base64_data.partition(';base64,')
+        if not separator:
+            payload = base64_data
+        elif self.trust_provided_content_type:
+            content_type = header.replace('data:', '')
+
+        file = Base64UploadedFile(
+            str(uuid.uuid4()), content_type, None, None)
+        try:
+            size = self.decode(payload, file)
+        except (binascii.Error, ValueError):
+            file.close()
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+        file.seek(0)
+        extension = filetype.guess_extension(file.read(261))
+        if extension not in self.ALLOWED_TYPES:
+            file.close()
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+
+        file.name = f'{file.name}.{extension}'
+        file.size = size
+        file.seek(0)
+        return serializers.ImageField.to_internal_value(self, file)
+
+    def decode(self, payload, file):
+        size, rest = 0, ''
+        for start in range(0, len(payload), DECODE_CHUNK_SIZE):
+            chunk = rest + ''.join(
+                payload[start:start + DECODE_CHUNK_SIZE].split())
+            end = len(chunk) - len(chunk) % 4
+            data = binascii.a2b_base64(chunk[:end])
+            rest = chunk[end:]
+            file.write(data)
+            size += len(data)
+        if rest:
+            raise ValueError('Неполная группа base64')
+        return size
+
+
+class ImageRenditionField(serializers.ReadOnlyField):
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = get_rendition_url(value, self.rendition)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
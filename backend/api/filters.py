@@ -1,28 +1,57 @@
-from recipe.models import Favorite, ShoppingCart
-
-
-def filter_recipes_by_params(queryset, request):
-    user = request.user
-    author_id = request.query_params.get('author')
-    if author_id:
-        queryset = queryset.filter(author__id=author_id)
-
-    is_favorited = request.query_params.get('is_favorited')
-    if is_favorited and str(is_favorited) == '1':
-        if user.is_authenticated:
-            favorite_ids = Favorite.objects.filter(
-                user=user).values_list('recipe', flat=True)
-            queryset = queryset.filter(id__in=favorite_ids)
-        else:
-            return queryset.none()
+from django.db.models import Exists, OuterRef
+from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+
+from recipe.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from .search import search_recipes
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class RecipeFilter(filters.FilterSet):
+    author = filters.NumberFilter(field_name='author')
+    is_favorited = filters.NumberFilter(method='filter_user_relation')
+    is_in_shopping_cart = filters.NumberFilter(
+        method='filter_user_relation')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    cooking_time = filters.RangeFilter()
+    search = filters.CharFilter(method='filter_search')
 
-    is_in_shopping_cart = request.query_params.get('is_in_shopping_cart')
-    if is_in_shopping_cart and str(is_in_shopping_cart) == '1':
-        if user.is_authenticated:
-            cart_ids = ShoppingCart.objects.filter(
-                user=user).values_list('recipe', flat=True)
-            queryset = queryset.filter(id__in=cart_ids)
-        else:
+    class Meta:
+        model = Recipe
+        fields = ('author', 'is_favorited', 'is_in_shopping_cart',
+                  'ingredients', 'exclude_ingredients', 'cooking_time')
+
+    def filter_user_relation(self, queryset, name, value):
+        if value != 1:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
             return queryset.none()
+        model = Favorite if name == 'is_favorited' else ShoppingCart
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk'))))
+
+    def filter_ingredients(self, queryset, name, value):
+        for ingredient in set(value):
+            queryset = queryset.filter(Exists(RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk'), ingredient=ingredient)))
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        return queryset.exclude(Exists(RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk'), ingredient__in=value)))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
 
-    return queryset
+def filter_recipes(request, queryset):
+    filterset = RecipeFilter(request.query_params, queryset=queryset,
+                             request=request)
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    return filterset.qs
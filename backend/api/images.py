@@ -0,0 +1,83 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from recipe.models import Recipe
+from users.models import User
+
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'medium': (640, 640),
+}
+MEDIA_REFERENCES = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+RENDITION_FORMAT = 'webp'
+RENDITION_QUALITY = 80
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+    thread_name_prefix='image-renditions',
+)
+
+
+def get_rendition_name(name, rendition):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'renditions',
+                        f'{stem}_{rendition}.{RENDITION_FORMAT}')
+
+
+def get_rendition_url(image, rendition):
+    name = get_rendition_name(image.name, rendition)
+    if image.storage.exists(name):
+        return image.storage.url(name)
+    return image.url
+
+
+def generate_renditions(name, storage=default_storage):
+    missing = {
+        rendition: size for rendition, size in RENDITIONS.items()
+        if not storage.exists(get_rendition_name(name, rendition))
+    }
+    if not missing:
+        return False
+
+    with storage.open(name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA')
+
+    for rendition, size in missing.items():
+        image = original.copy()
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+        storage.save(get_rendition_name(name, rendition),
+                     ContentFile(buffer.getvalue()))
+    return True
+
+
+def run_generate_renditions(name, on_generated=None):
+    try:
+        if generate_renditions(name) and on_generated is not None:
+            on_generated()
+    except Exception:
+        logger.exception('Не удалось создать превью для %s', name)
+
+
+def schedule_renditions(name, on_generated=None):
+    transaction.on_commit(
+        lambda: executor.submit(run_generate_renditions, name, on_generated))
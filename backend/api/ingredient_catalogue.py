@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from recipe.models import Ingredients
+from .ingredient_index import get_version
+from .serializers import IngredientSerializer
+
+
+CATALOGUE_KEY = 'ingredients:catalogue:{version}'
+CATALOGUE_TIMEOUT = 60 * 60 * 24
+GZIP_MIN_SIZE = 1024
+
+
+def build_catalogue():
+    serializer = IngredientSerializer(
+        Ingredients.objects.order_by('id'), many=True)
+    body = JSONRenderer().render(serializer.data)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    catalogue = {'body': body, 'etag': f'"{digest}"'}
+    if len(body) >= GZIP_MIN_SIZE:
+        catalogue['gzip'] = gzip.compress(body, mtime=0)
+        catalogue['gzip_etag'] = f'"{digest}-gzip"'
+    return catalogue
+
+
+def get_catalogue():
+    key = CATALOGUE_KEY.format(version=get_version())
+    catalogue = cache.get(key)
+    if catalogue is None:
+        catalogue = build_catalogue()
+        cache.set(key, catalogue, CATALOGUE_TIMEOUT)
+    return catalogue
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def catalogue_response(request):
+    catalogue = get_catalogue()
+    compressed = 'gzip' in catalogue and accepts_gzip(request)
+    etag = catalogue['gzip_etag'] if compressed else catalogue['etag']
+
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    elif compressed:
+        response = HttpResponse(catalogue['gzip'],
+                                content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(catalogue['body'],
+                                content_type='application/json')
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,63 @@
+import threading
+from bisect import bisect_left
+
+from recipe.models import Ingredients
+from .response_cache import bump_now_and_on_commit, get_versions
+
+
+SEARCH_LIMIT = 50
+VERSION_KEY = 'ingredients:version'
+
+
+def normalize(value):
+    return value.strip().casefold().replace('ё', 'е')
+
+
+def get_version():
+    return get_versions(VERSION_KEY)
+
+
+def invalidate_ingredients():
+    bump_now_and_on_commit(VERSION_KEY)
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = None
+        self._items = None
+
+    def build(self, version):
+        entries = sorted(
+            (normalize(name), name, pk, unit)
+            for pk, name, unit in Ingredients.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        keys = [entry[0] for entry in entries]
+        items = [{'id': pk, 'name': name, 'measurement_unit': unit}
+                 for _, name, pk, unit in entries]
+        with self._lock:
+            self._version, self._keys, self._items = version, keys, items
+        return keys, items
+
+    def get_entries(self):
+        version = get_version()
+        with self._lock:
+            if self._version == version:
+                return self._keys, self._items
+        return self.build(version)
+
+    def search(self, prefix, limit=SEARCH_LIMIT):
+        keys, items = self.get_entries()
+        prefix = normalize(prefix)
+        result = []
+        position = bisect_left(keys, prefix)
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(prefix)):
+            result.append(items[position])
+            position += 1
+        return result
+
+
+ingredient_index = IngredientIndex()
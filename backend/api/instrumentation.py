@@ -0,0 +1,211 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .response_cache import get_metrics
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+IN_PARAMS_PATTERN = re.compile(r'\((?:%s, )+%s\)')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def get_sql_shape(sql):
+    return IN_PARAMS_PATTERN.sub('(%s, ...)', sql)
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels)
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = defaultdict(lambda: [[0] * len(buckets), 0, 0])
+
+    def observe(self, labels, value):
+        counts, _, _ = series = self.series[labels]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            counts[index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield (f'{self.name}_bucket{{'
+                       f'{format_labels((*labels, ("le", bound)))}}} '
+                       f'{cumulative}')
+            yield (f'{self.name}_bucket{{'
+                   f'{format_labels((*labels, ("le", "+Inf")))}}} {count}')
+            yield f'{self.name}_sum{{{format_labels(labels)}}} {total}'
+            yield f'{self.name}_count{{{format_labels(labels)}}} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_duration = Histogram(
+            'foodgram_request_duration_seconds',
+            'Время обработки запроса', DURATION_BUCKETS)
+        self.db_duration = Histogram(
+            'foodgram_db_duration_seconds',
+            'Время запросов к БД за запрос', DURATION_BUCKETS)
+        self.db_queries = Histogram(
+            'foodgram_db_queries', 'Число запросов к БД за запрос',
+            QUERY_BUCKETS)
+        self.serializer_duration = Histogram(
+            'foodgram_serializer_duration_seconds',
+            'Время сериализации за запрос', DURATION_BUCKETS)
+        self.n_plus_one = Counter()
+
+    def observe(self, view, method, status, metrics, duration):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            self.request_duration.observe((*labels, ('status', status)),
+                                          duration)
+            self.db_duration.observe(labels, metrics.db_time)
+            self.db_queries.observe(labels, metrics.query_count)
+            self.serializer_duration.observe(labels,
+                                             metrics.serializer_time)
+            if metrics.repeated_queries:
+                self.n_plus_one[labels] += 1
+
+    def render(self):
+        with self.lock:
+            lines = [
+                *self.request_duration.render(),
+                *self.db_duration.render(),
+                *self.db_queries.render(),
+                *self.serializer_duration.render(),
+                '# HELP foodgram_n_plus_one_total Запросы с повторяющимся '
+                'SQL',
+                '# TYPE foodgram_n_plus_one_total counter',
+                *(f'foodgram_n_plus_one_total{{{format_labels(labels)}}} '
+                  f'{count}'
+                  for labels, count in sorted(self.n_plus_one.items())),
+            ]
+        lines.extend((
+            '# HELP foodgram_response_cache_total Обращения к кэшу ответов',
+            '# TYPE foodgram_response_cache_total counter',
+            *(f'foodgram_response_cache_total{{result="{result}"}} {count}'
+              for result, count in get_metrics().items()),
+        ))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.db_time = 0
+        self.serializer_time = 0
+        self.serializing = False
+        self.shapes = Counter()
+
+    @property
+    def query_count(self):
+        return sum(self.shapes.values())
+
+    @property
+    def repeated_queries(self):
+        threshold = settings.INSTRUMENTATION_N_PLUS_ONE
+        return [(shape, count) for shape, count in self.shapes.items()
+                if count > threshold]
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.shapes[get_sql_shape(sql)] += 1
+
+    def server_timing(self, duration):
+        return (f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{self.query_count} queries", '
+                f'serializer;dur={self.serializer_time * 1000:.1f}')
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+        metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            metrics.serializing = False
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        install_query_wrapper(None, connection)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.route if match is not None else 'unmatched'
+        registry.observe(view, request.method, response.status_code,
+                         metrics, duration)
+        for shape, count in metrics.repeated_queries:
+            logger.warning('Возможный N+1 в %s %s: %d повторов запроса %s',
+                           request.method, view, count, shape)
+        response['Server-Timing'] = metrics.server_timing(duration)
+        return response
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,66 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+DEFAULT_PATHS = ('/api/recipes/', '/api/recipes/?page=2',
+                 '/api/ingredients/?name=%D0%BA%D0%B0')
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный замер API запущенного сервера: пропускная "
+            "способность и задержки при параллельных клиентах")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Путь запроса, можно указать несколько раз")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--token', help="Токен для авторизованных "
+                                            "запросов")
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+        urls = [options['url'].rstrip('/') + path
+                for path in options['paths'] or DEFAULT_PATHS]
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers),
+                             timeout=options['timeout']) as response:
+                    response.read()
+                    code = response.status
+            except HTTPError as error:
+                code = error.code
+            except URLError:
+                code = None
+            return code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(
+                fetch, islice(cycle(urls), options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for code, _ in results
+                     if code is None or code >= 500)
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"Запросов: {len(results)}, параллельно: "
+            f"{options['concurrency']}, ошибок: {errors}")
+        self.stdout.write(
+            f"Пропускная способность: {len(results) / elapsed:.1f} запр/с")
+        self.stdout.write(
+            f"Задержка p50: {quantiles[49] * 1000:.1f} мс, "
+            f"p99: {quantiles[98] * 1000:.1f} мс")
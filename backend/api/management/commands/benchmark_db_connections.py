@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ("Задержка запроса к БД в цикле запрос-ответ с текущими "
+            "настройками соединений (DB_CONN_MAX_AGE, DB_POOL)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--conn-max-age', type=int, action='append',
+                            dest='conn_max_age',
+                            help="Переопределить CONN_MAX_AGE, можно "
+                                 "указать несколько значений для сравнения")
+
+    def handle(self, *args, **options):
+        created = []
+
+        def on_connection_created(sender, connection, **kwargs):
+            created.append(connection.alias)
+
+        connection_created.connect(on_connection_created, weak=False)
+        try:
+            for conn_max_age in options['conn_max_age'] or [None]:
+                if conn_max_age is not None:
+                    connection.close()
+                    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+                created.clear()
+                latencies = self.measure(options['requests'])
+                self.report(latencies, len(created))
+        finally:
+            connection_created.disconnect(on_connection_created)
+
+    def measure(self, requests):
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            try:
+                list(Recipe.objects.values_list('id', flat=True)[:6])
+            finally:
+                request_finished.send(sender=self.__class__)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def report(self, latencies, connections):
+        if 'pool' in connection.settings_dict.get('OPTIONS', {}):
+            mode = 'пул соединений'
+        else:
+            mode = f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{mode}: запросов {len(latencies)}, новых соединений "
+            f"{connections}")
+        self.stdout.write(
+            f"  среднее {statistics.mean(latencies) * 1000:.2f} мс, "
+            f"p50 {quantiles[49] * 1000:.2f} мс, "
+            f"p99 {quantiles[98] * 1000:.2f} мс")
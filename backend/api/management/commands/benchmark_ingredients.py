@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ingredient_index import IngredientIndex, SEARCH_LIMIT, get_version
+from recipe.models import Ingredients
+
+
+class Command(BaseCommand):
+    help = "Сравнение поиска ингредиентов по префиксу: ORM и индекс в памяти"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--prefix-length', type=int, default=2)
+
+    def handle(self, *args, **options):
+        length = options['prefix_length']
+        prefixes = sorted({
+            name[:length]
+            for name in Ingredients.objects.values_list('name', flat=True)
+            if len(name) >= length
+        })
+        if not prefixes:
+            self.stdout.write(self.style.WARNING("Нет ингредиентов"))
+            return
+
+        index = IngredientIndex()
+        start = time.perf_counter()
+        index.build(get_version())
+        build_time = time.perf_counter() - start
+
+        orm_time = self.measure(
+            lambda prefix: list(
+                Ingredients.objects.filter(name__istartswith=prefix)
+                .values('id', 'name', 'measurement_unit')[:SEARCH_LIMIT]),
+            prefixes, options['repeat'])
+        index_time = self.measure(
+            index.search, prefixes, options['repeat'])
+
+        self.stdout.write(
+            f"Префиксов: {len(prefixes)}, построение индекса: "
+            f"{build_time * 1000:.1f} мс")
+        self.stdout.write(
+            f"ORM: {orm_time * 1e6:.0f} мкс на запрос")
+        self.stdout.write(
+            f"Индекс: {index_time * 1e6:.0f} мкс на запрос")
+        self.stdout.write(self.style.SUCCESS(
+            f"Ускорение: x{orm_time / index_time:.1f}"))
+
+    def measure(self, search, prefixes, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for prefix in prefixes:
+                search(prefix)
+        return (time.perf_counter() - start) / (repeat * len(prefixes))
@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from api.fake_data import (DISHES, STYLES, fake_recipe_name,
+                           fake_recipe_text)
+from api.search import search_recipes
+from recipe.models import Ingredients, Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Сравнение полнотекстового поиска рецептов с icontains. "
+            "Сгенерированные рецепты удаляются после замера")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=0,
+                            help="Сколько рецептов сгенерировать")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def handle(self, *args, **options):
+        words = list(Ingredients.objects.values_list('name', flat=True)
+                     [:500]) or ['картофель', 'морковь', 'лук']
+        with transaction.atomic():
+            if options['recipes']:
+                start = time.perf_counter()
+                self.generate(options['recipes'], options['batch_size'],
+                              words)
+                self.stdout.write(
+                    f"Сгенерировано рецептов: {options['recipes']} за "
+                    f"{time.perf_counter() - start:.1f} с")
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE recipe_recipe')
+
+            total = Recipe.objects.count()
+            queries = [*DISHES[:5], *random.sample(words, min(5, len(words))),
+                       f'{STYLES[0]} {DISHES[0]}', 'несуществующее']
+            limit = options['limit']
+            search_time = self.measure(
+                lambda query: search_recipes(Recipe.objects.all(), query),
+                queries, options['repeat'], limit)
+            icontains_time = self.measure(
+                lambda query: Recipe.objects.filter(
+                    Q(name__icontains=query) | Q(text__icontains=query)
+                ).order_by('id'),
+                queries, options['repeat'], limit)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Рецептов: {total}, запросов: {len(queries)}, "
+            f"СУБД: {connection.vendor}")
+        self.stdout.write(
+            f"Полнотекстовый поиск: {search_time * 1000:.2f} мс на запрос")
+        self.stdout.write(
+            f"icontains: {icontains_time * 1000:.2f} мс на запрос")
+        self.stdout.write(self.style.SUCCESS(
+            f"Ускорение: x{icontains_time / search_time:.1f}"))
+
+    def generate(self, count, batch_size, words):
+        author = User.objects.create(
+            username=f'benchmark-{time.time_ns()}',
+            email=f'benchmark-{time.time_ns()}@example.com')
+        for offset in range(0, count, batch_size):
+            Recipe.objects.bulk_create(
+                Recipe(author=author,
+                       name=fake_recipe_name(random),
+                       text=fake_recipe_text(random, words),
+                       cooking_time=random.randint(5, 180))
+                for _ in range(min(batch_size, count - offset)))
+
+    def measure(self, search, queries, repeat, limit):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                queryset = search(query)
+                queryset.count()
+                list(queryset.values_list('id', flat=True)[:limit])
+        return (time.perf_counter() - start) / (repeat * len(queries))
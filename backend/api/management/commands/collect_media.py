@@ -0,0 +1,60 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.images import MEDIA_REFERENCES, RENDITIONS, get_rendition_name
+
+
+class Command(BaseCommand):
+    help = "Удаление файлов медиа, на которые не ссылается ни одна запись"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help="Не трогать файлы моложе указанного числа минут")
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        referenced = set()
+        directories = set()
+        for model, field in MEDIA_REFERENCES:
+            upload_to = model._meta.get_field(field).upload_to
+            directories.add(upload_to.rstrip('/'))
+            for name in (model.objects.exclude(**{field: ''})
+                         .exclude(**{f'{field}__isnull': True})
+                         .values_list(field, flat=True).iterator()):
+                referenced.add(name)
+                referenced.update(get_rendition_name(name, rendition)
+                                  for rendition in RENDITIONS)
+
+        deadline = timezone.now() - timedelta(minutes=options['grace'])
+        removed = size = 0
+        for directory in sorted(directories):
+            for name in self.walk(storage, directory):
+                if (name in referenced
+                        or storage.get_modified_time(name) > deadline):
+                    continue
+                size += storage.size(name)
+                removed += 1
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+
+        action = "Будет удалено" if options['dry_run'] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} файлов: {removed}, {size / 1024 / 1024:.1f} МБ"))
+
+    def walk(self, storage, directory):
+        if not storage.exists(directory):
+            return
+        subdirectories, files = storage.listdir(directory)
+        for filename in files:
+            yield os.path.join(directory, filename)
+        for subdirectory in subdirectories:
+            yield from self.walk(storage,
+                                 os.path.join(directory, subdirectory))
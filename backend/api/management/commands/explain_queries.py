@@ -0,0 +1,133 @@
+import re
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.coverage_index import CHANGES_LIMIT
+from api.filters import RecipeFilter
+from api.search import search_recipes
+from api.shopping_list import get_shopping_list
+from recipe.models import (Favorite, Ingredients, Recipe, RecipeIngredient,
+                           ShoppingCart)
+from users.models import User
+
+
+FULL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)\s*$', re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    help = "Проверка того, что горячие запросы API используют индексы"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int,
+                            help="id пользователя для запросов")
+        parser.add_argument('--show-plans', action='store_true')
+        parser.add_argument(
+            '--allow-seqscan', action='store_true',
+            help="Не запрещать PostgreSQL последовательное сканирование")
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f"СУБД {connection.vendor} не поддерживается")
+
+        if options['user']:
+            user = User.objects.get(pk=options['user'])
+        else:
+            user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError("В базе нет пользователей")
+
+        failures = []
+        with transaction.atomic():
+            if (connection.vendor == 'postgresql'
+                    and not options['allow_seqscan']):
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset, tables in self.get_queries(user):
+                plan = queryset.explain()
+                if options['show_plans']:
+                    self.stdout.write(f"{name}:\n{plan}\n")
+                scanned = set(pattern.findall(plan)) & set(tables)
+                if scanned:
+                    failures.append(f"{name}: {', '.join(sorted(scanned))}")
+                    self.stdout.write(self.style.ERROR(
+                        f"{name}: полное сканирование {sorted(scanned)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{name}: OK"))
+
+        if failures:
+            raise CommandError(
+                "Запросы без индексов:\n" + '\n'.join(failures))
+
+    def get_queries(self, user):
+        recipes = Recipe.objects.order_by('id')
+        page_ids = list(recipes.values_list('id', flat=True)[:6])
+        queries = [
+            ('Лента рецептов',
+             Recipe.objects.with_user_flags(user).order_by('id')[:6],
+             ('recipe_favorite', 'recipe_shoppingcart',
+              'recipe_subscription')),
+            ('Ингредиенты страницы ленты',
+             RecipeIngredient.objects.filter(recipe__in=page_ids)
+             .select_related('ingredient'),
+             ('recipe_recipeingredient',)),
+            ('Рецепты автора',
+             recipes.filter(author=user)[:6],
+             ('recipe_recipe',)),
+            ('Избранное',
+             recipes.filter(id__in=Favorite.objects.filter(user=user)
+                            .values('recipe'))[:6],
+             ('recipe_favorite',)),
+            ('Корзина',
+             recipes.filter(id__in=ShoppingCart.objects.filter(user=user)
+                            .values('recipe'))[:6],
+             ('recipe_shoppingcart',)),
+            ('Список покупок',
+             get_shopping_list(user),
+             ('recipe_shoppingcart', 'recipe_recipeingredient')),
+            ('Подписки',
+             User.objects.filter(subscribers__user=user).order_by('id')[:6],
+             ('recipe_subscription',)),
+            ('Поиск рецептов',
+             search_recipes(Recipe.objects.all(), 'суп')[:6],
+             ('recipe_recipe',)),
+            ('Изменённые рецепты',
+             Recipe.objects.filter(updated_at__gte=timezone.now())
+             .values_list('id', flat=True)[:CHANGES_LIMIT + 1],
+             ('recipe_recipe',)),
+        ]
+        ingredients = ','.join(
+            str(pk) for pk in RecipeIngredient.objects.values_list(
+                'ingredient', flat=True).distinct()[:2])
+        filters = (
+            ('ингредиенты', {'ingredients': ingredients}),
+            ('исключённые ингредиенты', {'exclude_ingredients': ingredients}),
+            ('время приготовления',
+             {'cooking_time_min': 10, 'cooking_time_max': 30}),
+            ('все параметры',
+             {'ingredients': ingredients, 'exclude_ingredients': '1',
+              'cooking_time_max': 60, 'is_favorited': 1,
+              'is_in_shopping_cart': 1, 'author': user.id}),
+        )
+        for name, params in filters:
+            filterset = RecipeFilter(
+                params, queryset=recipes,
+                request=SimpleNamespace(user=user))
+            queries.append(
+                (f'Фильтр: {name}', filterset.qs[:6],
+                 ('recipe_recipeingredient', 'recipe_favorite',
+                  'recipe_shoppingcart')))
+        if connection.vendor == 'postgresql':
+            queries.append(
+                ('Поиск ингредиентов',
+                 Ingredients.objects.filter(name__istartswith='аб'),
+                 ('recipe_ingredients',)))
+        return queries
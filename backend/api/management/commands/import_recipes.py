@@ -0,0 +1,231 @@
+import base64
+import binascii
+import json
+import os
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from api.dataset import (MEDIA, RECIPE, RECIPE_FIELDS, RELATIONS, USER,
+                         USER_FIELDS, open_dataset)
+from api.images import generate_renditions
+from api.ingredient_index import invalidate_ingredients
+from api.response_cache import RESPONSE_CACHE_ALIAS, invalidate_all
+from foodgram.storage import ContentAddressedStorage
+from recipe.counters import COUNTERS, recount
+from recipe.models import Ingredients, Recipe, RecipeIngredient
+from users.models import User
+
+
+def is_content_name(name):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return (len(stem) == 64 and stem[:2] == os.path.basename(directory)
+            and all(char in '0123456789abcdef' for char in stem))
+
+
+class Command(BaseCommand):
+    help = ("Загрузка выгрузки export_recipes. Существующие пользователи "
+            "(по email) и рецепты (по автору и названию) не дублируются. "
+            "Выгрузка загружается в одной транзакции")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.users, self.recipes, self.media = {}, {}, {}
+        self.counts = Counter()
+        self.storage = ContentAddressedStorage()
+        loaders = {USER: self.load_users, RECIPE: self.load_recipes}
+        for kind in RELATIONS:
+            loaders[kind] = self.load_relations
+        start = time.perf_counter()
+
+        kind, batch = None, []
+        try:
+            with open_dataset(options['path'], 'r') as file, \
+                    transaction.atomic():
+                for number, line in enumerate(file, 1):
+                    try:
+                        record = json.loads(line)
+                        model = record.pop('model')
+                    except (ValueError, KeyError, AttributeError):
+                        raise CommandError(
+                            f"Некорректная запись в строке {number}")
+                    if model == MEDIA:
+                        self.load_media(record)
+                        continue
+                    if model not in loaders:
+                        raise CommandError(
+                            f"Неизвестный тип записи в строке {number}: "
+                            f"{model}")
+                    if batch and (model != kind
+                                  or len(batch) >= options['batch_size']):
+                        loaders[kind](kind, batch)
+                        batch = []
+                    kind = model
+                    batch.append(record)
+                if batch:
+                    loaders[kind](kind, batch)
+                for counter in COUNTERS:
+                    recount(*counter)
+                invalidate_ingredients()
+                invalidate_all()
+        except OSError as error:
+            raise CommandError(f"Не удалось прочитать выгрузку: {error}")
+
+        if settings.CACHES[RESPONSE_CACHE_ALIAS]['BACKEND'].endswith(
+                'LocMemCache'):
+            self.stderr.write(self.style.WARNING(
+                "Кэш ответов локален для процесса: запущенные воркеры "
+                "увидят загруженные рецепты в анонимных ответах только "
+                "через RESPONSE_CACHE_TIMEOUT"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Загружено за {time.perf_counter() - start:.1f} с: "
+            + ', '.join(f'{kind} {count}'
+                        for kind, count in sorted(self.counts.items())
+                        if count)))
+
+    def load_users(self, kind, records):
+        emails, usernames = {}, set()
+        for pk, email, username in User.objects.filter(
+                Q(email__in=[record['email'] for record in records])
+                | Q(username__in=[record['username'] for record in records])
+        ).values_list('id', 'email', 'username'):
+            emails[email] = pk
+            usernames.add(username)
+
+        new = []
+        for record in records:
+            if record['email'] in emails:
+                self.users[record['id']] = emails[record['email']]
+                self.counts['user: уже были'] += 1
+                continue
+            if record['username'] in usernames:
+                self.counts['user: занят username'] += 1
+                continue
+            usernames.add(record['username'])
+            fields = {field: record[field] for field in USER_FIELDS}
+            fields['date_joined'] = parse_datetime(fields['date_joined'])
+            fields['avatar'] = self.media.get(fields['avatar'],
+                                              fields['avatar'])
+            new.append((record['id'], User(**fields)))
+
+        created = User.objects.bulk_create(user for _, user in new)
+        for (old_id, _), user in zip(new, created):
+            self.users[old_id] = user.pk
+        self.counts['user'] += len(created)
+
+    def load_recipes(self, kind, records):
+        skipped = [record for record in records
+                   if record['author'] not in self.users]
+        self.counts['recipe: без автора'] += len(skipped)
+        records = [record for record in records
+                   if record['author'] in self.users]
+        ingredient_ids = self.get_ingredients(
+            {(name, unit) for record in records
+             for name, unit, _ in record['ingredients']})
+        existing = {
+            (author_id, name): pk
+            for author_id, name, pk in Recipe.objects.filter(
+                author_id__in={self.users[record['author']]
+                               for record in records},
+                name__in={record['name'] for record in records},
+            ).values_list('author_id', 'name', 'id')
+        }
+
+        new, duplicates = {}, []
+        for record in records:
+            key = (self.users[record['author']], record['name'])
+            if key in existing:
+                self.recipes[record['id']] = existing[key]
+                self.counts['recipe: уже были'] += 1
+            elif key in new:
+                duplicates.append((record, new[key][1]))
+            else:
+                new[key] = (record, Recipe(
+                    author_id=key[0],
+                    image=self.media.get(record['image'], record['image']),
+                    **{field: record[field] for field in RECIPE_FIELDS}))
+
+        Recipe.objects.bulk_create(recipe for _, recipe in new.values())
+        for record, recipe in duplicates:
+            self.recipes[record['id']] = recipe.pk
+        self.counts['recipe: уже были'] += len(duplicates)
+        lines = []
+        for record, recipe in new.values():
+            self.recipes[record['id']] = recipe.pk
+            lines.extend(
+                RecipeIngredient(recipe=recipe,
+                                 ingredient_id=ingredient_ids[(name, unit)],
+                                 amount=amount)
+                for name, unit, amount in record['ingredients'])
+        RecipeIngredient.objects.bulk_create(lines)
+        self.counts['recipe'] += len(new)
+
+    def get_ingredients(self, pairs):
+        def lookup():
+            return {
+                (name, unit): pk
+                for pk, name, unit in Ingredients.objects.filter(
+                    name__in={name for name, _ in pairs},
+                ).values_list('id', 'name', 'measurement_unit')
+            }
+
+        ingredient_ids = lookup()
+        missing = pairs - ingredient_ids.keys()
+        if missing:
+            Ingredients.objects.bulk_create(
+                [Ingredients(name=name, measurement_unit=unit)
+                 for name, unit in missing],
+                ignore_conflicts=True)
+            ingredient_ids = lookup()
+        return ingredient_ids
+
+    def load_relations(self, kind, records):
+        model, field = RELATIONS[kind]
+        targets = self.recipes if field == 'recipe' else self.users
+        pairs = {
+            (self.users[record['user']], targets[record[field]])
+            for record in records
+            if record['user'] in self.users and record[field] in targets
+        }
+        existing = set(model.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            **{f'{field}_id__in': {target_id for _, target_id in pairs}},
+        ).values_list('user_id', f'{field}_id'))
+        new = pairs - existing
+        model.objects.bulk_create(
+            [model(user_id=user_id, **{f'{field}_id': target_id})
+             for user_id, target_id in new],
+            ignore_conflicts=True)
+        self.counts[kind] += len(new)
+        self.counts[f'{kind}: уже были'] += len(pairs & existing)
+
+    def load_media(self, record):
+        name = record['name']
+        if not self.storage.exists(name):
+            try:
+                content = base64.b64decode(record['data'], validate=True)
+            except (binascii.Error, TypeError):
+                raise CommandError(f"Содержимое файла {name} повреждено")
+            content_name = is_content_name(name)
+            directory = os.path.dirname(name)
+            if content_name:
+                directory = os.path.dirname(directory)
+            saved = self.storage.save(
+                os.path.join(directory, os.path.basename(name)),
+                ContentFile(content))
+            if content_name and saved != name:
+                raise CommandError(f"Содержимое файла {name} повреждено")
+            self.media[name] = saved
+            generate_renditions(saved, self.storage)
+        self.counts[MEDIA] += 1
@@ -0,0 +1,212 @@
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.fake_data import DISHES
+from recipe.models import Ingredients, Recipe
+from users.models import User
+
+
+DEFAULT_TRAFFIC = os.path.join(settings.BASE_DIR, 'data', 'load_test.jsonl')
+POOL_SIZE = 500
+AUTH_USERS = 20
+
+
+def percentile(values, number):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100)[number - 1]
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный прогон API внутри процесса: воспроизведение "
+            "трафика из JSONL, задержки p50/p95/p99 и число запросов к БД "
+            "по каждому эндпоинту. Изменения данных откатываются")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--traffic', default=DEFAULT_TRAFFIC)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--host', help="Заголовок Host запросов, по "
+                                           "умолчанию из ALLOWED_HOSTS")
+        parser.add_argument('--output', help="Сохранить результаты в JSON")
+        parser.add_argument('--baseline',
+                            help="JSON прошлого прогона для сравнения")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Допустимый рост p95, доля от базового")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        scenarios = self.read_traffic(options['traffic'])
+        ingredient_ids = self.sample_ids(Ingredients)
+        self.pools = {
+            'recipe_id': self.sample_ids(Recipe),
+            'user_id': self.sample_ids(User),
+            'ingredient_id': ingredient_ids,
+            'ingredient_prefix': list(
+                Ingredients.objects.filter(id__in=ingredient_ids)
+                .order_by('id').values_list('name', flat=True)),
+        }
+        if not all(self.pools.values()):
+            raise CommandError("Нет данных для прогона: выполните "
+                               "load_database и seed_fake_data")
+
+        host = options['host'] or next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        weights = [scenario['weight'] for scenario in scenarios]
+
+        with transaction.atomic():
+            self.tokens = [
+                Token.objects.get_or_create(user_id=user_id)[0].key
+                for user_id in self.pools['user_id'][:AUTH_USERS]]
+            for scenario in self.rng.choices(scenarios, weights,
+                                             k=options['warmup']):
+                self.send(client, scenario)
+
+            results = defaultdict(list)
+            start = time.perf_counter()
+            for scenario in self.rng.choices(scenarios, weights,
+                                             k=options['requests']):
+                results[scenario['name']].append(
+                    self.send(client, scenario))
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        report = {name: self.summarize(samples)
+                  for name, samples in sorted(results.items())}
+        self.print_report(report, options['requests'], elapsed)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def sample_ids(self, model):
+        bounds = model.objects.aggregate(Min('id'), Max('id'))
+        if bounds['id__min'] is None:
+            return []
+        population = range(bounds['id__min'], bounds['id__max'] + 1)
+        candidates = self.rng.sample(population,
+                                     min(POOL_SIZE, len(population)))
+        return list(model.objects.filter(id__in=candidates).order_by('id')
+                    .values_list('id', flat=True))
+
+    def read_traffic(self, path):
+        scenarios = []
+        try:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        scenario = json.loads(line)
+                        scenario.setdefault('method', 'GET')
+                        scenario.setdefault('weight', 1)
+                        scenarios.append(scenario)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Не удалось прочитать {path}: {error}")
+        if not scenarios:
+            raise CommandError(f"Нет сценариев в {path}")
+        return scenarios
+
+    def render_path(self, path):
+        return path.format(
+            recipe_id=self.rng.choice(self.pools['recipe_id']),
+            user_id=self.rng.choice(self.pools['user_id']),
+            ingredient_id=self.rng.choice(self.pools['ingredient_id']),
+            ingredient_ids=','.join(
+                str(pk) for pk in self.rng.sample(
+                    self.pools['ingredient_id'],
+                    min(5, len(self.pools['ingredient_id'])))),
+            ingredient_prefix=quote(
+                self.rng.choice(self.pools['ingredient_prefix'])[:2]),
+            search=quote(self.rng.choice(DISHES)),
+            page=self.rng.randint(1, 5),
+        )
+
+    def send(self, client, scenario):
+        headers = {}
+        if scenario.get('auth'):
+            headers['HTTP_AUTHORIZATION'] = (
+                f'Token {self.rng.choice(self.tokens)}')
+        path = self.render_path(scenario['path'])
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.generic(
+                scenario['method'], path,
+                json.dumps(scenario['data']) if 'data' in scenario else '',
+                content_type='application/json', **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return (time.perf_counter() - start, len(queries),
+                response.status_code)
+
+    def summarize(self, samples):
+        latencies = sorted(latency for latency, _, _ in samples)
+        queries = [count for _, count, _ in samples]
+        statuses = Counter(f'{status // 100}xx' for _, _, status in samples)
+        return {
+            'requests': len(samples),
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'queries': statistics.mean(queries),
+            'max_queries': max(queries),
+            'statuses': dict(sorted(statuses.items())),
+        }
+
+    def print_report(self, report, requests, elapsed):
+        self.stdout.write(
+            f"{'эндпоинт':<26}{'запр':>6}{'p50 мс':>9}{'p95 мс':>9}"
+            f"{'p99 мс':>9}{'SQL':>6}{'макс':>6}  статусы")
+        for name, row in report.items():
+            statuses = ' '.join(f'{status}:{count}'
+                                for status, count in row['statuses'].items())
+            self.stdout.write(
+                f"{name:<26}{row['requests']:>6}{row['p50']:>9.1f}"
+                f"{row['p95']:>9.1f}{row['p99']:>9.1f}"
+                f"{row['queries']:>6.1f}{row['max_queries']:>6}  {statuses}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Запросов: {requests} за {elapsed:.1f} с, "
+            f"{requests / elapsed:.1f} запр/с"))
+
+    def compare(self, report, path, tolerance):
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Не удалось прочитать {path}: {error}")
+
+        regressions = []
+        for name, row in report.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if row['max_queries'] > base['max_queries']:
+                regressions.append(
+                    f"{name}: SQL {base['max_queries']} -> "
+                    f"{row['max_queries']}")
+            if row['p95'] > base['p95'] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: p95 {base['p95']:.1f} -> {row['p95']:.1f} мс")
+            if (row['statuses'].get('5xx', 0)
+                    > base['statuses'].get('5xx', 0)):
+                regressions.append(f"{name}: ошибки 5xx")
+        if regressions:
+            raise CommandError("Регрессии относительно базового прогона:\n"
+                               + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            "Регрессий относительно базового прогона нет"))
@@ -0,0 +1,121 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.fake_data import fake_recipe_name, fake_recipe_text
+from api.response_cache import invalidate_all
+from recipe.counters import COUNTERS, recount
+from recipe.models import (Favorite, Ingredients, Recipe, RecipeIngredient,
+                           ShoppingCart, Subscription)
+from users.models import User
+
+
+FAKE_PASSWORD = 'fake-password'
+
+
+class Command(BaseCommand):
+    help = ("Генерация синтетических пользователей, рецептов, избранного, "
+            "корзин и подписок для нагрузочного тестирования")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=10)
+        parser.add_argument('--min-ingredients', type=int, default=3)
+        parser.add_argument('--max-ingredients', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--subscriptions-per-user', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int,
+                            help="Зерно генератора для воспроизводимости")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredients.objects.values_list('id',
+                                                              flat=True))
+        words = list(Ingredients.objects.values_list('name', flat=True)
+                     [:500]) or ['картофель', 'морковь', 'лук']
+        if not ingredient_ids:
+            raise CommandError("Сначала загрузите ингредиенты: "
+                               "manage.py load_database")
+        if not 0 < options['min_ingredients'] <= options['max_ingredients']:
+            raise CommandError("Некорректное число ингредиентов в рецепте")
+
+        start = time.perf_counter()
+        prefix = f'fake-{time.time_ns()}'
+        password = make_password(FAKE_PASSWORD)
+        user_ids = self.create(User, (
+            User(username=f'{prefix}-{number}',
+                 email=f'{prefix}-{number}@example.com',
+                 first_name='Тестовый', last_name=f'Автор {number}',
+                 password=password)
+            for number in range(options['users'])))
+
+        recipe_ids = self.create(Recipe, (
+            Recipe(author_id=author_id, name=fake_recipe_name(self.rng),
+                   text=fake_recipe_text(self.rng, words),
+                   cooking_time=self.rng.randint(5, 180))
+            for author_id in user_ids
+            for _ in range(options['recipes_per_user'])))
+
+        lines = self.create(RecipeIngredient, (
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=self.rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in self.sample(
+                ingredient_ids, self.rng.randint(options['min_ingredients'],
+                                                 options['max_ingredients']))))
+
+        relations = {}
+        for model, targets, field, per_user in (
+                (Favorite, recipe_ids, 'recipe_id',
+                 options['favorites_per_user']),
+                (ShoppingCart, recipe_ids, 'recipe_id',
+                 options['carts_per_user']),
+                (Subscription, user_ids, 'author_id',
+                 options['subscriptions_per_user'])):
+            relations[model] = self.create(model, (
+                model(user_id=user_id, **{field: target_id})
+                for user_id in user_ids
+                for target_id in self.sample(targets, per_user)
+                if target_id != user_id or field != 'author_id'))
+
+        for counter in COUNTERS:
+            with transaction.atomic():
+                recount(*counter)
+        invalidate_all()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано за {time.perf_counter() - start:.1f} с: "
+            f"пользователей {len(user_ids)}, рецептов {len(recipe_ids)}, "
+            f"ингредиентов в рецептах {len(lines)}, "
+            f"избранного {len(relations[Favorite])}, "
+            f"в корзинах {len(relations[ShoppingCart])}, "
+            f"подписок {len(relations[Subscription])}. "
+            f"Пароль пользователей: {FAKE_PASSWORD}"))
+
+    def sample(self, population, size):
+        return self.rng.sample(population, min(size, len(population)))
+
+    def create(self, model, objects):
+        ids, batch = [], []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                ids.extend(self.flush(model, batch))
+                batch = []
+        if batch:
+            ids.extend(self.flush(model, batch))
+        return ids
+
+    def flush(self, model, batch):
+        with transaction.atomic():
+            created = model.objects.bulk_create(batch)
+        if self.verbosity > 1:
+            self.stdout.write(f"{model.__name__}: +{len(created)}")
+        return [obj.pk for obj in created]
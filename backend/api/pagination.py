@@ -1,5 +1,48 @@
+from django.db import connections
 from rest_framework import pagination
+from rest_framework.response import Response
 
 
 class CustomPaginator(pagination.PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class CursorPaginator(pagination.CursorPagination):
+    ordering = 'id'
+    page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = get_approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+def get_approximate_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def get_recipe_paginator(request):
+    if request.query_params.get('search'):
+        return CustomPaginator()
+    if (request.query_params.get('pagination') == 'cursor'
+            or CursorPaginator.cursor_query_param in request.query_params):
+        return CursorPaginator()
+    return CustomPaginator()
@@ -0,0 +1,49 @@
+from django.db import IntegrityError, transaction
+
+from recipe.models import Favorite, ShoppingCart, Subscription
+
+
+RELATION_FIELDS = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'subscriptions': (Subscription, 'author_id'),
+}
+EMPTY_RELATIONS = {name: frozenset() for name in RELATION_FIELDS}
+
+
+class Relations(dict):
+    def __init__(self, user_id):
+        super().__init__()
+        self.user_id = user_id
+
+    def __missing__(self, name):
+        model, field = RELATION_FIELDS[name]
+        self[name] = frozenset(model.objects.filter(user_id=self.user_id)
+                               .values_list(field, flat=True))
+        return self[name]
+
+
+def get_relations(request):
+    if request is None or not request.user.is_authenticated:
+        return EMPTY_RELATIONS
+
+    relations = getattr(request, 'user_relations', None)
+    if relations is None:
+        relations = Relations(request.user.id)
+        request.user_relations = relations
+    return relations
+
+
+def add_relation(model, **fields):
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_relation(model, **fields):
+    with transaction.atomic():
+        deleted, _ = model.objects.filter(**fields).delete()
+    return bool(deleted)
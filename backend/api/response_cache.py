@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.models import Recipe
+
+
+RESPONSE_CACHE_ALIAS = 'responses'
+GLOBAL_VERSION_KEY = 'responses:version'
+LIST_VERSION_KEY = 'responses:recipes:version'
+RECIPE_VERSION_KEY = 'responses:recipe:{recipe_id}:version'
+LIST_KEY = 'responses:recipes:{versions}:{params}'
+RECIPE_KEY = 'responses:recipe:{recipe_id}:{versions}:{params}'
+METRICS = ('hit', 'miss')
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+metrics = Counter()
+metrics_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def get_versions(*keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, time.time_ns, timeout=None)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+async def aget_versions(*keys):
+    cache = get_cache()
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = await cache.aget_or_set(key, time.time_ns,
+                                                    timeout=None)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_versions(*keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_now_and_on_commit(*keys):
+    bump_versions(*keys)
+    transaction.on_commit(lambda: bump_versions(*keys))
+
+
+def invalidate_recipe(recipe_id):
+    bump_now_and_on_commit(
+        LIST_VERSION_KEY, RECIPE_VERSION_KEY.format(recipe_id=recipe_id))
+
+
+def invalidate_author(user_id):
+    recipe_ids = Recipe.objects.filter(author_id=user_id).values_list(
+        'id', flat=True)
+    bump_now_and_on_commit(
+        LIST_VERSION_KEY,
+        *(RECIPE_VERSION_KEY.format(recipe_id=pk) for pk in recipe_ids))
+
+
+def invalidate_all():
+    bump_now_and_on_commit(GLOBAL_VERSION_KEY)
+
+
+def record(name):
+    with metrics_lock:
+        metrics[name] += 1
+
+
+def get_metrics():
+    with metrics_lock:
+        return {name: metrics[name] for name in METRICS}
+
+
+def normalize_params(request):
+    params = sorted(
+        (name, values) for name, values in request.query_params.lists())
+    raw = repr((request.scheme, request.get_host(), params))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def recipes_list_key(request):
+    return LIST_KEY.format(
+        versions=get_versions(GLOBAL_VERSION_KEY, LIST_VERSION_KEY),
+        params=normalize_params(request))
+
+
+def recipe_key(request, id):
+    return RECIPE_KEY.format(
+        recipe_id=id,
+        versions=get_versions(GLOBAL_VERSION_KEY,
+                              RECIPE_VERSION_KEY.format(recipe_id=id)),
+        params=normalize_params(request))
+
+
+async def arecipes_list_key(request):
+    return LIST_KEY.format(
+        versions=await aget_versions(GLOBAL_VERSION_KEY, LIST_VERSION_KEY),
+        params=normalize_params(request))
+
+
+async def arecipe_key(request, id):
+    return RECIPE_KEY.format(
+        recipe_id=id,
+        versions=await aget_versions(
+            GLOBAL_VERSION_KEY, RECIPE_VERSION_KEY.format(recipe_id=id)),
+        params=normalize_params(request))
+
+
+def get_cached_headers(response):
+    return {header: response[header] for header in CACHED_HEADERS
+            if response.has_header(header)}
+
+
+def cache_anonymous_response(get_key):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            key = get_key(request, *args, **kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                record('hit')
+                data, headers = cached
+                response = Response(data, status=status.HTTP_200_OK,
+                                    headers=headers)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            record('miss')
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, (response.data, get_cached_headers(response)))
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,95 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_CONFIG = 'russian'
+SEARCH_WEIGHTS = [0.1, 0.2, 0.4, 1.0]
+FTS_TABLE = 'recipe_recipe_fts'
+FTS_WEIGHTS = (10.0, 1.0)
+MAX_TERMS = 10
+TERM_PATTERN = re.compile(r'\w+')
+FTS_TRIGGERS = {
+    f'{FTS_TABLE}_insert': (
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert '
+        'AFTER INSERT ON recipe_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'),
+    f'{FTS_TABLE}_delete': (
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete '
+        'AFTER DELETE ON recipe_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+        "VALUES ('delete', old.id, old.name, old.text); END"),
+    f'{FTS_TABLE}_update': (
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update '
+        'AFTER UPDATE OF name, text ON recipe_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+        "VALUES ('delete', old.id, old.name, old.text); "
+        f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'),
+}
+
+
+def search_postgresql(queryset, query):
+    search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                               search_type='websearch')
+    vector = RawSQL(f'{queryset.model._meta.db_table}.search_vector', [],
+                    output_field=SearchVectorField())
+    return (queryset.alias(search_vector=vector)
+            .filter(search_vector=search_query)
+            .annotate(search_rank=SearchRank(
+                F('search_vector'), search_query,
+                weights=SEARCH_WEIGHTS, normalization=1)))
+
+
+def search_sqlite(queryset, query):
+    terms = TERM_PATTERN.findall(query)[:MAX_TERMS]
+    if not terms:
+        return queryset.none()
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id',
+               f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    )
+
+
+def ensure_sqlite_triggers(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name LIKE %s",
+                       [f'{FTS_TABLE}%'])
+        existing = {name for name, in cursor.fetchall()}
+        missing = [statement for name, statement in FTS_TRIGGERS.items()
+                   if name not in existing]
+        if FTS_TABLE not in existing or not missing:
+            return False
+        for statement in missing:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+SEARCH_BACKENDS = {
+    'postgresql': search_postgresql,
+    'sqlite': search_sqlite,
+}
+
+
+def search_recipes(queryset, query):
+    query = query.strip()
+    if not query:
+        return queryset
+    search = SEARCH_BACKENDS[connections[queryset.db].vendor]
+    return search(queryset, query).order_by('-search_rank', 'id')
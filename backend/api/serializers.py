@@ -1,15 +1,26 @@
 from rest_framework import serializers
-from recipe.models import (Recipe, Ingredients, RecipeIngredient)
+from rest_framework.settings import api_settings
+from recipe.models import (Recipe, Ingredients, RecipeIngredient,
+                           Subscription)
 from users.models import User
-from drf_extra_fields.fields import Base64ImageField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import transaction
+
+from .fields import ImageRenditionField, StreamingBase64ImageField
+from .instrumentation import TimedSerializerMixin
+from .relations import add_relation, get_relations
 
 
 MIN_VALUE_VALIDATE = 1
 MAX_VALUE_VALIDATE = 32000
 
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedModelSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
+    pass
+
+
+class UserSerializer(TimedModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
 
@@ -20,12 +31,11 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def get_is_subscribed(self, obj):
-        request = self.context['request']
-        user = request.user
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
 
-        if (request and not user.is_anonymous):
-            return user.subscriptions.filter(author=obj).exists()
-        return False
+        relations = get_relations(self.context.get('request'))
+        return obj.id in relations['subscriptions']
 
     def get_avatar(self, obj):
         request = self.context.get('request')
@@ -34,17 +44,18 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
 
-class RecipeShortLinkSerializer(serializers.ModelSerializer):
+class RecipeShortLinkSerializer(TimedModelSerializer):
     image = serializers.ImageField()
+    image_thumbnail = ImageRenditionField('thumbnail', source='image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
         read_only_fields = fields
 
 
-class AvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(required=True)
+class AvatarSerializer(TimedModelSerializer):
+    avatar = StreamingBase64ImageField(required=True)
 
     class Meta:
         model = User
@@ -53,7 +64,7 @@ class AvatarSerializer(serializers.ModelSerializer):
 
 class UserSubscribeSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
 
@@ -64,17 +75,18 @@ class UserSubscribeSerializer(UserSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
-        request = self.context['request']
-        user = request.user
-        if user.is_anonymous:
-            return False
-        return obj.subscribers.filter(user=user).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        relations = get_relations(self.context.get('request'))
+        return obj.id in relations['subscriptions']
 
     def get_recipes(self, obj):
         request = self.context.get('request')
+        if hasattr(obj, 'limited_recipes'):
+            return RecipeShortLinkSerializer(obj.limited_recipes, many=True,
+                                             context={'request': request}).data
+
         recipes_limit = request.query_params.get('recipes_limit')
         queryset = obj.recipes.all()
         if recipes_limit is not None and recipes_limit.isdigit():
@@ -99,20 +111,25 @@ class SubscribeCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 'Нельзя подписаться на себя')
 
-        if author in user.subscriptions.values_list('author', flat=True):
-            raise serializers.ValidationError('Подписка уже существует')
-
         return data
 
+    def create(self, validated_data):
+        if not add_relation(Subscription, user=self.context['request'].user,
+                            author=self.context['author']):
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Подписка уже существует']})
+        return self.context['author']
+
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedModelSerializer):
     class Meta:
         model = Ingredients
         fields = ('id', 'name', 'measurement_unit')
         read_only_fields = fields
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(TimedModelSerializer):
     id = serializers.ReadOnlyField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
@@ -123,8 +140,26 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class IngredientsDetailSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredients.objects.all())
+class IngredientsDetailListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.ingredients = Ingredients.objects.in_bulk(
+                [item['id'] for item in data
+                 if isinstance(item, dict)
+                 and isinstance(item.get('id'), int)])
+        return super().to_internal_value(data)
+
+
+class IngredientField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        ingredients = getattr(self.parent.parent, 'ingredients', {})
+        if isinstance(data, int) and data in ingredients:
+            return ingredients[data]
+        return super().to_internal_value(data)
+
+
+class IngredientsDetailSerializer(TimedModelSerializer):
+    id = IngredientField(queryset=Ingredients.objects.all())
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit')
@@ -137,14 +172,15 @@ class IngredientsDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = IngredientsDetailListSerializer
 
 
-class ForChangeRecipeSerializer(serializers.ModelSerializer):
+class ForChangeRecipeSerializer(TimedModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = IngredientsDetailSerializer(many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField(required=True)
+    image = StreamingBase64ImageField(required=True)
     cooking_time = serializers.IntegerField(
         validators=[
             MinValueValidator(MIN_VALUE_VALIDATE),
@@ -202,8 +238,10 @@ class ForChangeRecipeSerializer(serializers.ModelSerializer):
                     amount=i['amount'],
                 )
             )
-        RecipeIngredient.objects.bulk_create(ingredients)
+        if ingredients:
+            RecipeIngredient.objects.bulk_create(ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_list = validated_data.pop('ingredients')
         validated_data.pop('author', None)
@@ -212,51 +250,92 @@ class ForChangeRecipeSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients_list)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients_list):
+        amounts = {i['id'].id: i['amount'] for i in ingredients_list}
+        lines = {line.ingredient_id: line for line in
+                 RecipeIngredient.objects.select_for_update()
+                 .filter(recipe=recipe)}
+
+        removed = [line.id for ingredient, line in lines.items()
+                   if ingredient not in amounts]
+        changed = []
+        for ingredient, line in lines.items():
+            amount = amounts.get(ingredient, line.amount)
+            if amount != line.amount:
+                line.amount = amount
+                changed.append(line)
+
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            recipe, [i for i in ingredients_list if i['id'].id not in lines])
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_list = validated_data.pop('ingredients')
+        ingredients_list = validated_data.pop('ingredients', None)
 
         if ingredients_list is not None:
-            instance.recipe_ingredient.all().delete()
-            self.create_ingredients(instance, ingredients_list)
+            self.update_ingredients(instance, ingredients_list)
 
         return super().update(instance, validated_data)
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.favorited_by.filter(user=request.user).exists()
+        relations = get_relations(self.context.get('request'))
+        return obj.id in relations['favorites']
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request is None or not request.user.is_authenticated:
-            return False
-        return obj.in_cart.filter(user=request.user).exists()
+        relations = get_relations(self.context.get('request'))
+        return obj.id in relations['shopping_cart']
 
 
-class ForReadRecipeSerializer(serializers.ModelSerializer):
+class ForReadRecipeSerializer(TimedModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(many=True,
                                              read_only=True,
                                              source='recipe_ingredient')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_medium = ImageRenditionField('medium', source='image')
 
     class Meta:
         model = Recipe
         fields = ('id', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_medium',
+                  'text', 'cooking_time')
         read_only_fields = fields
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.favorited_by.filter(user=request.user).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+
+        relations = get_relations(self.context.get('request'))
+        return obj.id in relations['favorites']
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request is None or not request.user.is_authenticated:
-            return False
-        return obj.in_cart.filter(user=request.user).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+
+        relations = get_relations(self.context.get('request'))
+        return obj.id in relations['shopping_cart']
+
+
+class CookableRecipeSerializer(ForReadRecipeSerializer):
+    missing_ingredients = serializers.SerializerMethodField()
+
+    class Meta(ForReadRecipeSerializer.Meta):
+        fields = ForReadRecipeSerializer.Meta.fields + (
+            'missing_ingredients',)
+        read_only_fields = fields
+
+    def get_missing_ingredients(self, obj):
+        available = self.context['available']
+        missing = [line for line in obj.recipe_ingredient.all()
+                   if line.ingredient_id not in available]
+        return RecipeIngredientSerializer(missing, many=True).data
@@ -0,0 +1,49 @@
+import csv
+
+from django.db.models import Sum
+
+from recipe.models import RecipeIngredient
+
+
+CHUNK_SIZE = 500
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    return (
+        RecipeIngredient.objects
+        .filter(recipe__in_cart__user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total_amount=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def get_rows(queryset):
+    for item in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield (item['ingredient__name'],
+               item['total_amount'],
+               item['ingredient__measurement_unit'])
+
+
+def render_txt(queryset):
+    yield 'Список покупок:\n'
+    for name, amount, unit in get_rows(queryset):
+        yield f'-{name}: {amount} {unit}\n'
+
+
+def render_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for row in get_rows(queryset):
+        yield writer.writerow(row)
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+}
@@ -0,0 +1,69 @@
+from functools import partial
+
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+
+from recipe.models import Ingredients, Recipe, RecipeIngredient
+from recipe.signals import touch_recipe
+from users.models import User
+from .images import schedule_renditions
+from .ingredient_index import invalidate_ingredients
+from .response_cache import (invalidate_all, invalidate_author,
+                             invalidate_recipe)
+from .search import ensure_sqlite_triggers
+
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'email', 'avatar')
+
+
+@receiver([post_save, post_delete], sender=Ingredients)
+def invalidate_ingredient_responses(sender, **kwargs):
+    invalidate_ingredients()
+    invalidate_all()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.label == 'recipe':
+        ensure_sqlite_triggers(using)
+
+
+def refresh_recipe(recipe_id):
+    touch_recipe(recipe_id)
+    invalidate_recipe(recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_renditions(sender, instance, **kwargs):
+    if instance.image:
+        schedule_renditions(instance.image.name,
+                            partial(refresh_recipe, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe_responses(sender, instance, **kwargs):
+    invalidate_recipe(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def invalidate_recipe_ingredient_responses(sender, instance, **kwargs):
+    invalidate_recipe(instance.recipe_id)
+
+
+def get_author_state(user):
+    return tuple(
+        str(user.__dict__.get(field, '')) for field in AUTHOR_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_author_state(sender, instance, **kwargs):
+    instance._author_state = get_author_state(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, created, **kwargs):
+    state = get_author_state(instance)
+    if not created and state != instance._author_state:
+        invalidate_author(instance.pk)
+    instance._author_state = state
@@ -0,0 +1,821 @@
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import (TestCase, TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.coverage_index import CoverageIndex
+from api import images
+from api.dataset import MEDIA, RECIPE, USER, dump_record
+from api.filters import RecipeFilter
+from api.images import generate_renditions
+from api.instrumentation import RequestMetrics, current_metrics
+from api.management.commands.import_recipes import is_content_name
+from api.response_cache import invalidate_all
+from api.search import ensure_sqlite_triggers
+from api.signals import create_recipe_renditions
+from foodgram.storage import ContentAddressedStorage
+from recipe.counters import COUNTERS, recount
+from recipe.management.commands import load_database
+from recipe.models import (Favorite, Ingredients, Recipe, RecipeIngredient,
+                           ShoppingCart, Subscription)
+from users.models import User
+
+
+PASSWORD = 'test-Pa55word'
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwAD'
+    'hgGAWjR9awAAAABJRU5ErkJggg==')
+IMAGE = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+INGREDIENT_AMOUNTS = object()
+
+QUERY_BUDGETS = (
+    ('users-list', 'GET', 'users/?limit=100', None, True, 4),
+    ('users-create', 'POST', 'users/',
+     {'email': 'budget-{n}@example.com', 'username': 'budget-{n}',
+      'first_name': 'Бюджет', 'last_name': 'Запросов',
+      'password': PASSWORD}, False, 5),
+    ('users-retrieve', 'GET', 'users/{author}/', None, True, 3),
+    ('users-me', 'GET', 'users/me/', None, True, 2),
+    ('users-subscriptions', 'GET', 'users/subscriptions/?limit=100', None,
+     True, 4),
+    ('users-subscriptions-limited', 'GET',
+     'users/subscriptions/?limit=100&recipes_limit=1', None, True, 4),
+    ('users-subscribe', 'POST', 'users/{stranger}/subscribe/', None, True, 8),
+    ('users-unsubscribe', 'DELETE', 'users/{stranger}/subscribe/', None,
+     True, 6),
+    ('users-avatar', 'PUT', 'users/me/avatar/', {'avatar': IMAGE}, True, 3),
+    ('users-avatar-delete', 'DELETE', 'users/me/avatar/', None, True, 3),
+    ('recipes-list', 'GET', 'recipes/?limit=100', None, False, 3),
+    ('recipes-list-auth', 'GET', 'recipes/?limit=100', None, True, 4),
+    ('recipes-favorited', 'GET', 'recipes/?is_favorited=1&limit=100', None,
+     True, 4),
+    ('recipes-in-cart', 'GET', 'recipes/?is_in_shopping_cart=1&limit=100',
+     None, True, 4),
+    ('recipes-cursor', 'GET', 'recipes/?pagination=cursor&limit=100', None,
+     True, 3),
+    ('recipes-create', 'POST', 'recipes/',
+     {'name': 'Бюджет {n}', 'text': 'Текст', 'cooking_time': 10,
+      'image': IMAGE, 'ingredients': INGREDIENT_AMOUNTS}, True, 11),
+    ('recipe', 'GET', 'recipes/{recipe}/', None, False, 2),
+    ('recipe-auth', 'GET', 'recipes/{recipe}/', None, True, 3),
+    ('recipe-update', 'PATCH', 'recipes/{own_recipe}/',
+     {'name': 'Обновлённый', 'ingredients': INGREDIENT_AMOUNTS},
+     True, 12),
+    ('recipe-delete', 'DELETE', 'recipes/{created}/', None, True, 9),
+    ('recipes-cookable', 'GET',
+     'recipes/cookable/?ingredients={ingredients}&limit=100', None, True, 6),
+    ('download-shopping-cart', 'GET', 'recipes/download_shopping_cart/',
+     None, True, 3),
+    ('download-shopping-cart-csv', 'GET',
+     'recipes/download_shopping_cart/?type=csv', None, True, 3),
+    ('short-link', 'GET', 'recipes/{recipe}/get-link/', None, False, 1),
+    ('favorite', 'POST', 'recipes/{own_recipe}/favorite/', None, True, 6),
+    ('favorite-delete', 'DELETE', 'recipes/{own_recipe}/favorite/', None,
+     True, 6),
+    ('shopping-cart', 'POST', 'recipes/{own_recipe}/shopping_cart/', None,
+     True, 6),
+    ('shopping-cart-delete', 'DELETE', 'recipes/{own_recipe}/shopping_cart/',
+     None, True, 6),
+    ('ingredients-list', 'GET', 'ingredients/', None, False, 0),
+    ('ingredients-search', 'GET', 'ingredients/?name=бюдж', None, False, 0),
+    ('ingredient', 'GET', 'ingredients/{ingredient}/', None, False, 1),
+)
+
+
+def create_user(username, **fields):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password=PASSWORD, first_name='Тест', last_name='Тестов', **fields)
+
+
+def create_ingredients(count, prefix='ингредиент'):
+    return Ingredients.objects.bulk_create(
+        Ingredients(name=f'{prefix} {number}', measurement_unit='г')
+        for number in range(count))
+
+
+def create_recipes(authors, count, ingredients):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {number}', text='Описание',
+               cooking_time=10)
+        for author in authors for number in range(count))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipes for ingredient in ingredients)
+    return recipes
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+
+
+class RecipeFeedQueriesTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        authors = [create_user(f'author-{number}') for number in range(5)]
+        recipes = create_recipes(authors, 12, create_ingredients(3))
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2])
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3])
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author)
+            for author in authors[:2])
+
+    def assert_constant_queries(self, count):
+        for limit in (1, 50):
+            with self.subTest(limit=limit), self.assertNumQueries(count):
+                response = self.client.get('/api/recipes/',
+                                           {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_feed_queries_do_not_grow_with_limit(self):
+        self.assert_constant_queries(3)
+
+    def test_authenticated_feed_queries_do_not_grow_with_limit(self):
+        self.client.force_authenticate(self.user)
+        self.assert_constant_queries(3)
+
+    def test_feed_reads_user_flags_from_annotations(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/recipes/', {'limit': 12})
+        first, second = response.data['results'][:2]
+        self.assertTrue(first['is_favorited'])
+        self.assertTrue(first['is_in_shopping_cart'])
+        self.assertTrue(first['author']['is_subscribed'])
+        self.assertFalse(second['is_favorited'])
+        self.assertEqual(len(first['ingredients']), 3)
+
+
+class InstrumentationTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        create_recipes([create_user('author')], 3, create_ingredients(2))
+        settings_override = override_settings(MIDDLEWARE=[
+            'api.instrumentation.InstrumentationMiddleware',
+            *settings.MIDDLEWARE])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_serialization_time_is_reported(self):
+        data = serializers.BaseSerializer.data
+        response = self.client.get('/api/recipes/')
+        timings = dict(part.strip().split(';')[:2] for part in
+                       response['Server-Timing'].split(','))
+        self.assertGreater(float(timings['serializer'][4:]), 0)
+        self.assertIs(serializers.BaseSerializer.data, data)
+
+    def test_worker_thread_queries_are_counted(self):
+        def run_query():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connection.close()
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            async_to_sync(sync_to_async(run_query, thread_sensitive=False))()
+        finally:
+            current_metrics.reset(token)
+        self.assertEqual(metrics.query_count, 1)
+
+
+class QueryBudgetTest(MediaRootMixin, APITestCase):
+    size = 2
+
+    def setUp(self):
+        super().setUp()
+        self.context = self.seed(self.size)
+        self.anonymous = APIClient()
+
+    def seed(self, size):
+        storage = ContentAddressedStorage()
+        image = storage.save('recipes/budget.png', ContentFile(PNG))
+        generate_renditions(image, storage)
+
+        subject = create_user('subject', is_staff=True)
+        stranger, *authors = User.objects.bulk_create(
+            User(username=f'budget-author-{number}',
+                 email=f'budget-author-{number}@example.com',
+                 first_name='Бюджет', last_name='Запросов')
+            for number in range(size + 1))
+        ingredients = create_ingredients(size, 'бюджет')
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='Текст',
+                   cooking_time=10, image=image)
+            for author in (subject, stranger, *authors)
+            for number in range(size))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in recipes for ingredient in ingredients)
+        foreign = [recipe for recipe in recipes
+                   if recipe.author_id != subject.pk]
+        Favorite.objects.bulk_create(
+            Favorite(user=subject, recipe=recipe) for recipe in foreign)
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=subject, recipe=recipe) for recipe in foreign)
+        Subscription.objects.bulk_create(
+            Subscription(user=subject, author=author) for author in authors)
+        for counter in COUNTERS:
+            recount(*counter)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=subject)}')
+
+        return {
+            'n': 0,
+            'author': authors[0].pk,
+            'stranger': stranger.pk,
+            'recipe': foreign[0].pk,
+            'own_recipe': recipes[0].pk,
+            'created': 0,
+            'ingredient': ingredients[0].pk,
+            'ingredients': ','.join(str(item.pk) for item in ingredients),
+            'ingredient_amounts': [{'id': item.pk, 'amount': 5}
+                                   for item in ingredients],
+        }
+
+    def request(self, name, method, path, data, auth):
+        self.context['n'] += 1
+        body = ''
+        if data is not None:
+            body = json.dumps({
+                key: (self.context['ingredient_amounts']
+                      if value is INGREDIENT_AMOUNTS
+                      else value.format_map(self.context)
+                      if isinstance(value, str) else value)
+                for key, value in data.items()})
+        response = (self.client if auth else self.anonymous).generic(
+            method, '/api/' + path.format_map(self.context), body,
+            content_type='application/json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code == 201 and name == 'recipes-create':
+            self.context['created'] = response.json()['id']
+        return response
+
+    def test_queries_fit_budget(self):
+        for name, method, path, data, auth, _ in QUERY_BUDGETS:
+            self.request(name, method, path, data, auth)
+        for name, method, path, data, auth, budget in QUERY_BUDGETS:
+            invalidate_all()
+            with self.subTest(name), self.assertNumQueries(budget):
+                response = self.request(name, method, path, data, auth)
+                self.assertLess(response.status_code, 400)
+
+
+class LargeQueryBudgetTest(QueryBudgetTest):
+    size = 5
+
+
+class IngredientCatalogueTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        create_ingredients(3, 'соль')
+
+    def get_names(self, **params):
+        response = self.client.get('/api/ingredients/', params)
+        return {item['name'] for item in json.loads(response.content)}
+
+    def test_not_modified_until_catalogue_changes(self):
+        etag = self.client.get('/api/ingredients/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Ingredients.objects.create(name='сахар', measurement_unit='г')
+        response = self.client.get('/api/ingredients/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_gzip_catalogue_is_revalidated_without_queries(self):
+        create_ingredients(100, 'перец')
+        etag = self.client.get('/api/ingredients/',
+                               HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertTrue(etag.endswith('-gzip"'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/',
+                                       HTTP_ACCEPT_ENCODING='gzip',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_search_follows_signals_and_bulk_loads(self):
+        self.assertEqual(self.get_names(name='сах'), set())
+        with self.assertNumQueries(0):
+            self.get_names(name='со')
+
+        ingredient = Ingredients.objects.create(name='сахар',
+                                                measurement_unit='г')
+        self.assertEqual(self.get_names(name='сах'), {'сахар'})
+        ingredient.name = 'сахарная пудра'
+        ingredient.save()
+        self.assertEqual(self.get_names(name='сах'), {'сахарная пудра'})
+        ingredient.delete()
+        self.assertEqual(self.get_names(name='сах'), set())
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv',
+                                         encoding='utf-8') as file:
+            file.write('сахар,г\n')
+            file.flush()
+            call_command('load_database', file.name, stdout=StringIO())
+        self.assertEqual(self.get_names(name='сах'), {'сахар'})
+        self.assertIn('сахар', self.get_names())
+
+
+class CoverageIndexTest(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.salt, self.sugar = create_ingredients(2)
+        self.recipe, = create_recipes([self.author], 1, [self.salt])
+        self.index = CoverageIndex()
+
+    def search(self, *ingredients):
+        return self.index.search([item.pk for item in ingredients])
+
+    def test_changes_made_elsewhere_are_applied(self):
+        self.assertEqual(self.search(self.salt), [(self.recipe.pk, 0)])
+        other, = create_recipes([self.author], 1, [self.sugar])
+        self.assertEqual(self.search(self.sugar), [(other.pk, 0)])
+        RecipeIngredient.objects.filter(recipe=self.recipe).update(
+            ingredient=self.sugar)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now())
+        self.assertEqual(self.search(self.salt), [])
+        self.assertEqual(self.search(self.sugar),
+                         [(self.recipe.pk, 0), (other.pk, 0)])
+
+    def test_deleted_recipes_are_refreshed_without_rebuild(self):
+        other, = create_recipes([self.author], 1, [self.salt])
+        self.search(self.salt)
+        Recipe.objects.filter(pk=self.recipe.pk).delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search(self.salt),
+                             [(self.recipe.pk, 0), (other.pk, 0)])
+        with self.assertNumQueries(1):
+            self.index.refresh([self.recipe.pk])
+        self.assertEqual(self.search(self.salt), [(other.pk, 0)])
+
+    def test_cookable_view_drops_deleted_recipes(self):
+        with mock.patch('api.views.coverage_index', self.index):
+            url = f'/api/recipes/cookable/?ingredients={self.salt.pk}'
+            self.assertEqual(self.client.get(url).data['count'], 1)
+            self.recipe.delete()
+            self.assertEqual(self.client.get(url).data['results'], [])
+            self.assertEqual(self.client.get(url).data['count'], 0)
+
+    def test_unchanged_catalogue_costs_one_query(self):
+        self.search(self.salt)
+        with self.assertNumQueries(1):
+            self.search(self.salt)
+
+
+class LoadDatabaseTest(TestCase):
+    def test_ingredients_keep_file_order(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv',
+                                         encoding='utf-8') as file:
+            file.write('яблоко,г\nабрикос,г\nяблоко,г\nвишня,шт\n')
+            file.flush()
+            call_command('load_database', file.name, chunk_size=10,
+                         stdout=StringIO())
+        self.assertEqual(
+            list(Ingredients.objects.order_by('id')
+                 .values_list('name', 'measurement_unit')),
+            [('яблоко', 'г'), ('абрикос', 'г'), ('вишня', 'шт')])
+
+
+class ReadJsonTest(TestCase):
+    def read(self, text):
+        stream = StringIO(text)
+        with mock.patch.object(load_database, 'JSON_BLOCK_SIZE', 16):
+            try:
+                return list(load_database.read_json(stream)), stream
+            except CommandError:
+                return None, stream
+
+    def test_items_split_across_blocks(self):
+        items = [{'name': f'ингредиент {number}', 'measurement_unit': 'г'}
+                 for number in range(50)]
+        rows, _ = self.read(json.dumps(items, ensure_ascii=False, indent=1))
+        self.assertEqual(rows, [(item['name'], 'г') for item in items])
+
+    def test_malformed_item_stops_reading(self):
+        text = '[{"name": "соль", "measurement_unit": "г"}, {"name": ' + (
+            ', '.join(['{"name": "сахар", "measurement_unit": "г"}'] * 1000))
+        rows, stream = self.read(text)
+        self.assertIsNone(rows)
+        self.assertLess(stream.tell(), 1000)
+
+
+class ImportRecipesTest(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = os.path.join(self.media_root, 'dump.jsonl')
+
+    def user(self, number, avatar=None):
+        return dump_record(
+            USER, id=number, email=f'user-{number}@example.com',
+            username=f'user-{number}', first_name='Тест', last_name='Тестов',
+            password='', avatar=avatar, is_active=True, is_staff=False,
+            is_superuser=False, date_joined='2024-01-01T00:00:00Z')
+
+    def media(self, name, data=PNG):
+        return dump_record(MEDIA, name=name,
+                           data=base64.b64encode(data).decode())
+
+    def load(self, *records):
+        with open(self.dataset, 'w', encoding='utf-8') as file:
+            file.writelines(records)
+        stdout = StringIO()
+        call_command('import_recipes', self.dataset, batch_size=1,
+                     stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_legacy_media_names_are_rewritten(self):
+        self.load(
+            self.media('users/avatar.png'),
+            self.user(1, 'users/avatar.png'),
+            self.media('recipes/image.png'),
+            dump_record(RECIPE, id=1, author=1, name='Рецепт',
+                        text='Описание', cooking_time=10,
+                        image='recipes/image.png', ingredients=[]))
+        avatar = User.objects.get().avatar
+        image = Recipe.objects.get().image
+        for name in (avatar.name, image.name):
+            self.assertTrue(is_content_name(name))
+            self.assertTrue(default_storage.exists(name))
+        self.assertTrue(image.name.startswith('recipes/'))
+
+    def test_corrupted_media_leaves_database_untouched(self):
+        name = f'recipes/00/{"0" * 64}.png'
+        with self.assertRaises(CommandError):
+            self.load(self.user(1), self.user(2), self.media(name),
+                      self.user(3))
+        self.assertFalse(User.objects.exists())
+
+    def test_existing_relations_are_not_counted_as_loaded(self):
+        subscription = dump_record('subscription', user=1, author=2)
+        output = self.load(self.user(1), self.user(2), subscription,
+                           subscription)
+        self.assertEqual(Subscription.objects.count(), 1)
+        self.assertIn('subscription 1,', output)
+        self.assertIn('subscription: уже были 1', output)
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('planner')
+        authors = [cls.user] + [create_user(f'cook-{number}')
+                                for number in range(3)]
+        recipes = create_recipes(authors, 10, create_ingredients(5))
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2])
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3])
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author)
+            for author in authors[1:])
+
+    def test_hot_queries_use_indexes(self):
+        call_command('explain_queries', user=self.user.pk, stdout=StringIO())
+
+
+class RecipeFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('filter')
+        cls.salt, cls.sugar, cls.flour = create_ingredients(3)
+        recipes = {}
+        for name, cooking_time, ingredients in (
+                ('суп', 10, (cls.salt, cls.sugar)),
+                ('каша', 30, (cls.sugar,)),
+                ('хлеб', 60, (cls.flour, cls.salt))):
+            recipes[name] = Recipe.objects.create(
+                author=cls.user, name=name, text='Описание',
+                cooking_time=cooking_time)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipes[name], ingredient=ingredient,
+                                 amount=1)
+                for ingredient in ingredients)
+        Favorite.objects.create(user=cls.user, recipe=recipes['суп'])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes['каша'])
+
+    def filter(self, **params):
+        filterset = RecipeFilter(
+            params, queryset=Recipe.objects.order_by('id'),
+            request=SimpleNamespace(user=self.user))
+        with self.assertNumQueries(1):
+            return list(filterset.qs.values_list('name', flat=True))
+
+    def test_each_combination_is_one_query(self):
+        ids = f'{self.salt.pk},{self.sugar.pk}'
+        for params, expected in (
+                ({'ingredients': str(self.salt.pk)}, ['суп', 'хлеб']),
+                ({'ingredients': ids}, ['суп']),
+                ({'exclude_ingredients': str(self.flour.pk)},
+                 ['суп', 'каша']),
+                ({'cooking_time_min': 20, 'cooking_time_max': 60},
+                 ['каша', 'хлеб']),
+                ({'is_favorited': 1}, ['суп']),
+                ({'is_in_shopping_cart': 1}, ['каша']),
+                ({'ingredients': str(self.sugar.pk),
+                  'exclude_ingredients': str(self.salt.pk),
+                  'cooking_time_max': 30, 'is_in_shopping_cart': 1,
+                  'author': self.user.pk}, ['каша'])):
+            with self.subTest(params=params):
+                self.assertEqual(self.filter(**params), expected)
+
+
+class SearchSchemaTest(TestCase):
+    def test_search_index_is_maintained_by_database(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT name FROM sqlite_master "
+                               "WHERE type = 'trigger' AND tbl_name = %s",
+                               ['recipe_recipe'])
+                self.assertEqual(
+                    {name for name, in cursor.fetchall()},
+                    {'recipe_recipe_fts_insert', 'recipe_recipe_fts_delete',
+                     'recipe_recipe_fts_update'})
+            else:
+                columns = connection.introspection.get_table_description(
+                    cursor, 'recipe_recipe')
+                self.assertIn('search_vector',
+                              {column.name for column in columns})
+
+
+class RecipeSearchTest(MediaRootMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('author')
+        self.ingredient, = create_ingredients(1)
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_created_and_updated_recipe_is_found(self):
+        image = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+        response = self.client.post('/api/recipes/', {
+            'name': 'Окрошка на квасе', 'text': 'Холодный суп',
+            'cooking_time': 20, 'image': image,
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 5}]},
+            format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search('окрошка'), ['Окрошка на квасе'])
+        self.client.patch(f"/api/recipes/{response.data['id']}/", {
+            'name': 'Свекольник', 'cooking_time': 20,
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 5}]},
+            format='json')
+        self.assertEqual(self.search('окрошка'), [])
+        self.assertEqual(self.search('свекольник'), ['Свекольник'])
+
+    def test_dropped_triggers_are_restored(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Триггеры поиска нужны только в SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER recipe_recipe_fts_insert')
+        create_recipes([self.user], 1, [])
+        self.assertEqual(self.search('рецепт'), [])
+        self.assertTrue(ensure_sqlite_triggers(connection.alias))
+        self.assertEqual(self.search('рецепт'), ['Рецепт 0'])
+        self.assertFalse(ensure_sqlite_triggers(connection.alias))
+
+
+class RecipeRenditionTest(MediaRootMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        image = ContentAddressedStorage().save('recipes/image.png',
+                                               ContentFile(PNG))
+        self.recipe, = create_recipes([create_user('author')], 1, [])
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=image)
+        self.recipe.refresh_from_db()
+
+    def get_recipe(self):
+        return self.client.get(f'/api/recipes/{self.recipe.pk}/')
+
+    def test_finished_renditions_change_etag(self):
+        before = self.get_recipe()
+        with mock.patch.object(images.executor, 'submit',
+                               lambda function, *args: function(*args)), \
+                self.captureOnCommitCallbacks(execute=True):
+            create_recipe_renditions(Recipe, self.recipe)
+        after = self.get_recipe()
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertNotEqual(after.data['image_medium'],
+                            before.data['image_medium'])
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{self.recipe.pk}/',
+                            HTTP_IF_NONE_MATCH=before['ETag']).status_code,
+            200)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentRelationTest(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.user = create_user('clicker')
+        self.author = create_user('author')
+        self.recipe = create_recipes([self.author], 1, [])[0]
+
+    def post_concurrently(self, path):
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(client.post(path).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post)
+                   for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def test_duplicate_posts_create_one_row(self):
+        for path, model, counted, field in (
+                (f'/api/recipes/{self.recipe.pk}/favorite/', Favorite,
+                 self.recipe, 'favorites_count'),
+                (f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+                 ShoppingCart, self.recipe, 'shopping_carts_count'),
+                (f'/api/users/{self.author.pk}/subscribe/', Subscription,
+                 self.author, 'subscribers_count')):
+            with self.subTest(path=path):
+                statuses = self.post_concurrently(path)
+                self.assertEqual(statuses,
+                                 [201] + [400] * (self.THREADS - 1))
+                self.assertEqual(
+                    model.objects.filter(user=self.user).count(), 1)
+                counted.refresh_from_db()
+                self.assertEqual(getattr(counted, field), 1)
+
+
+class Base64UploadTest(MediaRootMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(create_user('user'))
+
+    def upload(self, payload):
+        return self.client.put(
+            '/api/users/me/avatar/',
+            {'avatar': 'data:image/png;base64,' + payload}, format='json')
+
+    def test_payload_with_line_breaks_is_accepted(self):
+        buffer = BytesIO()
+        Image.frombytes('RGB', (300, 300), os.urandom(300 * 300 * 3)).save(
+            buffer, 'PNG')
+        self.assertGreater(buffer.tell(), 200 * 1024)
+        response = self.upload(
+            base64.encodebytes(buffer.getvalue()).decode())
+        self.assertEqual(response.status_code, 200)
+
+    def test_truncated_payload_is_rejected(self):
+        payload = base64.b64encode(PNG).decode().rstrip('=')[:-1]
+        self.assertEqual(self.upload(payload).status_code, 400)
+
+
+class RelationFlagsTest(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('reader')
+        self.author = create_user('author')
+        self.recipe = create_recipes([self.author], 1, [])[0]
+        self.client.force_authenticate(self.user)
+
+    def test_flags_follow_changes_made_elsewhere(self):
+        recipe_url = f'/api/recipes/{self.recipe.pk}/'
+        author_url = f'/api/users/{self.author.pk}/'
+        recipe = self.client.get(recipe_url)
+        author = self.client.get(author_url)
+        self.assertFalse(recipe.data['is_favorited'])
+        self.assertFalse(author.data['is_subscribed'])
+
+        Favorite.objects.bulk_create(
+            [Favorite(user=self.user, recipe=self.recipe)])
+        Subscription.objects.bulk_create(
+            [Subscription(user=self.user, author=self.author)])
+
+        response = self.client.get(recipe_url,
+                                   HTTP_IF_NONE_MATCH=recipe['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+        response = self.client.get(author_url,
+                                   HTTP_IF_NONE_MATCH=author['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_subscribed'])
+
+    def test_only_needed_relations_are_loaded(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/')
+        self.assertFalse(response.data['is_subscribed'])
+
+
+class AuthorInvalidationTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.get(pk=create_user('author').pk)
+        patcher = mock.patch('api.signals.invalidate_author')
+        self.invalidate_author = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_password_change_keeps_author_responses(self):
+        self.author.set_password('new-password-123')
+        with self.assertNumQueries(1):
+            self.author.save()
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=('last_login',))
+        self.invalidate_author.assert_not_called()
+
+    def test_name_change_invalidates_author_responses(self):
+        self.author.first_name = 'Новое'
+        self.author.save()
+        self.invalidate_author.assert_called_once_with(self.author.pk)
+        self.author.save()
+        self.invalidate_author.assert_called_once()
+
+
+class MediaCollectionTest(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = ContentAddressedStorage()
+
+    def save_old_image(self):
+        name = self.storage.save('recipes/image.png', ContentFile(PNG))
+        past = time.time() - 2 * 60 * 60
+        os.utime(self.storage.path(name), (past, past))
+        return name
+
+    def test_unreferenced_old_file_is_removed(self):
+        name = self.save_old_image()
+        call_command('collect_media', stdout=StringIO())
+        self.assertFalse(self.storage.exists(name))
+
+    def test_reuploaded_file_survives_until_grace_period_ends(self):
+        name = self.save_old_image()
+        self.assertEqual(
+            self.storage.save('recipes/copy.png', ContentFile(PNG)), name)
+        call_command('collect_media', stdout=StringIO())
+        self.assertTrue(self.storage.exists(name))
+
+    def test_image_shared_with_deleted_recipe_is_kept(self):
+        name = self.save_old_image()
+        author = create_user('author')
+        recipe, _ = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='Описание',
+                   cooking_time=10, image=name)
+            for number in range(2))
+        recipe.delete()
+        call_command('collect_media', stdout=StringIO())
+        self.assertTrue(self.storage.exists(name))
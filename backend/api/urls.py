@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.urls import path, include
 from .views import (recipes_list, get_recipe, ingredients_list,
                     get_ingredient, short_url_recipe, add_favorite,
                     shopping_cart, download_shopping_cart,
-                    UsersViewSet)
+                    cookable_recipes, UsersViewSet)
 from rest_framework.routers import DefaultRouter
 
+if settings.API_ASYNC_VIEWS:
+    from .async_views import (recipes_list, get_recipe,  # noqa: F811
+                              ingredients_list, add_favorite, shopping_cart)
+
 router = DefaultRouter()
 router.register(r'users', UsersViewSet, 'user')
 
@@ -15,6 +20,7 @@ urlpatterns = [
     path('recipes/<int:id>/', get_recipe, name='get-recipe'),
     path('recipes/<int:id>/shopping_cart/', shopping_cart,
          name='shopping-cart'),
+    path('recipes/cookable/', cookable_recipes, name='cookable-recipes'),
     path('recipes/download_shopping_cart/', download_shopping_cart,
          name="download-shopping-cart"),
     path('recipes/<int:id>/get-link/', short_url_recipe, name='short-link'),
@@ -7,18 +7,32 @@ from rest_framework.permissions import (IsAuthenticated,
                                         AllowAny)
 from djoser.views import UserViewSet
 from djoser.serializers import UserCreateSerializer
-from django.http import HttpResponse
+from django.db.models import F, Prefetch, Value
+from django.http import StreamingHttpResponse
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
 from recipe.models import (Recipe, Ingredients, Favorite, Subscription,
                            ShoppingCart)
 from .serializers import (IngredientSerializer, ForReadRecipeSerializer,
                           UserSerializer, UserSubscribeSerializer,
                           ForChangeRecipeSerializer, AvatarSerializer,
-                          RecipeShortLinkSerializer, SubscribeCreateSerializer)
+                          RecipeShortLinkSerializer, SubscribeCreateSerializer,
+                          CookableRecipeSerializer)
 from users.models import User
-from .pagination import CustomPaginator
-from .filters import filter_recipes_by_params
+from .pagination import CustomPaginator, get_recipe_paginator
+from .conditional import (recipe_etag, recipe_last_modified, recipes_list_etag,
+                          set_page_validators, set_recipe_validators,
+                          set_user_validators, user_etag, user_last_modified)
+from .relations import add_relation, remove_relation
+from .response_cache import (cache_anonymous_response, recipe_key,
+                             recipes_list_key)
+from .filters import filter_recipes
+from .coverage_index import MAX_INGREDIENTS, MAX_MISSING, coverage_index
+from .ingredient_catalogue import catalogue_response
+from .ingredient_index import ingredient_index
+from .shopping_list import SHOPPING_LIST_FORMATS, get_shopping_list
 
 
 class UsersViewSet(UserViewSet):
@@ -46,10 +60,14 @@ class UsersViewSet(UserViewSet):
         self.serializer_class = UserCreateSerializer
         return super().create(request, *args, **kwargs)
 
+    @method_decorator(condition(etag_func=user_etag,
+                                last_modified_func=user_last_modified))
     def retrieve(self, request, id=None):
         user = get_object_or_404(User, pk=id)
         serializer = UserSerializer(user, context={'request': request})
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        set_user_validators(request, response, user)
+        return response
 
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
@@ -60,32 +78,29 @@ class UsersViewSet(UserViewSet):
     @action(detail=True, methods=['post', 'delete'],
             url_path='subscribe', permission_classes=[IsAuthenticated])
     def subscribe(self, request, id=None):
-        author = get_object_or_404(User, pk=id)
         user = request.user
 
         if request.method == 'POST':
+            author = get_object_or_404(User, pk=id)
             serializer = SubscribeCreateSerializer(
                 data=request.data,
                 context={'request': request,
                          'author': author})
             serializer.is_valid(raise_exception=True)
+            serializer.save()
 
-            subscription = Subscription.objects.create(user=user,
-                                                       author=author)
             serializer = UserSubscribeSerializer(author,
                                                  context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        subscription = user.subscriptions.filter(author=author).first()
+        if remove_relation(Subscription, user=user, author_id=id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if not subscription:
-            return Response(
-                {'errors': 'Подписка не нейдена'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, pk=id)
+        return Response(
+            {'errors': 'Подписка не нейдена'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
     @action(detail=False, methods=['put', 'delete'], url_path='me/avatar')
     def avatar_update(self, request):
@@ -95,18 +110,24 @@ class UsersViewSet(UserViewSet):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        request.user.avatar.delete()
         request.user.avatar = None
         request.user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'], url_path='subscriptions')
     def subscriptions(self, request):
-        subscription = request.user.subscriptions.all()
+        authors = (User.objects.filter(subscribers__user=request.user)
+                   .annotate(subscribed_at=F('subscribers__created_at'),
+                             is_subscribed=Value(True))
+                   .order_by('subscribed_at', 'id'))
+
+        recipes = Recipe.objects.order_by('-id')
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is not None and recipes_limit.isdigit():
+            recipes = recipes[:int(recipes_limit)]
+        authors = authors.prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes'))
 
-        authors = []
-        for sub in subscription:
-            authors.append(sub.author)
         obj = self.paginate_queryset(authors)
         if obj is not None:
             serializer = UserSubscribeSerializer(obj, many=True,
@@ -120,6 +141,8 @@ class UsersViewSet(UserViewSet):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@condition(etag_func=recipes_list_etag)
+@cache_anonymous_response(recipes_list_key)
 def recipes_list(request):
 
     if request.method == 'POST':
@@ -135,21 +158,30 @@ def recipes_list(request):
         return Response(response_serializer.data,
                         status=status.HTTP_201_CREATED)
 
-    recipes = Recipe.objects.all().order_by('id')
+    recipes = (Recipe.objects.with_ingredients()
+               .with_user_flags(request.user)
+               .order_by('id'))
 
-    recipes = filter_recipes_by_params(recipes, request)
+    recipes = filter_recipes(request, recipes)
 
-    paginator = CustomPaginator()
+    paginator = get_recipe_paginator(request)
     result_page = paginator.paginate_queryset(recipes, request)
     serializer = ForReadRecipeSerializer(result_page, many=True,
                                          context={'request': request})
-    return paginator.get_paginated_response(serializer.data)
+    response = paginator.get_paginated_response(serializer.data)
+    set_page_validators(request, response, result_page)
+    return response
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@condition(etag_func=recipe_etag, last_modified_func=recipe_last_modified)
+@cache_anonymous_response(recipe_key)
 def get_recipe(request, id):
-    recipe = get_object_or_404(Recipe, id=id)
+    recipes = Recipe.objects.all()
+    if request.method == 'GET':
+        recipes = recipes.with_ingredients().with_user_flags(request.user)
+    recipe = get_object_or_404(recipes, id=id)
 
     if request.method == 'PATCH':
         serializer = ForChangeRecipeSerializer(recipe, data=request.data,
@@ -176,7 +208,48 @@ def get_recipe(request, id):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     serializer = ForReadRecipeSerializer(recipe, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    response = Response(serializer.data, status=status.HTTP_200_OK)
+    set_recipe_validators(request, response, recipe)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def cookable_recipes(request):
+    try:
+        available = {
+            int(value)
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value.strip()
+        }
+        max_missing = int(request.query_params.get('missing', 0))
+    except ValueError:
+        return Response({'errors': 'Некорректные параметры запроса'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if not 0 < len(available) <= MAX_INGREDIENTS:
+        return Response(
+            {'errors': f'Укажите от 1 до {MAX_INGREDIENTS} ингредиентов'},
+            status=status.HTTP_400_BAD_REQUEST)
+    if not 0 <= max_missing <= MAX_MISSING:
+        return Response(
+            {'errors': f'Параметр missing должен быть от 0 до {MAX_MISSING}'},
+            status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = CustomPaginator()
+    page = paginator.paginate_queryset(
+        coverage_index.search(available, max_missing), request)
+    recipes = (Recipe.objects.with_ingredients()
+               .with_user_flags(request.user)
+               .in_bulk([recipe_id for recipe_id, _ in page]))
+    deleted = [recipe_id for recipe_id, _ in page if recipe_id not in recipes]
+    if deleted:
+        coverage_index.refresh(deleted)
+    serializer = CookableRecipeSerializer(
+        [recipes[recipe_id] for recipe_id, _ in page
+         if recipe_id in recipes],
+        many=True, context={'request': request, 'available': available})
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -194,74 +267,66 @@ def short_url_recipe(request, id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_shopping_cart(request):
-    cart = request.user.shop_cart.select_related('recipe')
+    file_type = request.query_params.get('type', 'txt')
+    if file_type not in SHOPPING_LIST_FORMATS:
+        return Response({'error':
+                         'Неподдерживаемый формат файла'},
+                        status=status.HTTP_400_BAD_REQUEST)
 
-    if not cart.exists():
+    if not request.user.shop_cart.exists():
         return Response({'error':
                          'Корзина пустая'},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    information = []
-    for rec in cart:
-        recipe = rec.recipe
-        information.append(f'-- {recipe.name}')
-        information.append('Ингредиенты:')
-
-        for q in recipe.recipe_ingredient.all():
-            i = q.ingredient
-            information.append(
-                f'-{i.name}: {q.amount} {i.measurement_unit}'
-            )
-
-        information.append('')
-
-    response = HttpResponse('\n'.join(information), content_type='text/plain')
+    render, content_type = SHOPPING_LIST_FORMATS[file_type]
+    response = StreamingHttpResponse(
+        render(get_shopping_list(request.user)),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping-list.{file_type}"')
     return response
 
 
 @api_view(['POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def shopping_cart(request, id):
-    recipe = get_object_or_404(Recipe, id=id)
     if request.method == 'POST':
-        if request.user.shop_cart.filter(recipe=recipe).exists():
+        recipe = get_object_or_404(Recipe, id=id)
+        if not add_relation(ShoppingCart, user=request.user, recipe=recipe):
             return Response({'error':
                              'Рецепт уже добавлен в корзину'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        ShoppingCart.objects.create(user=request.user, recipe=recipe)
         serializer = RecipeShortLinkSerializer(recipe,
                                                context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    shopping_cart = request.user.shop_cart.filter(recipe=recipe)
-    if shopping_cart.exists():
-        shopping_cart.delete()
+    if remove_relation(ShoppingCart, user=request.user, recipe_id=id):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    get_object_or_404(Recipe, id=id)
     return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def add_favorite(request, id):
-    recipe = get_object_or_404(Recipe, pk=id)
     if request.method == 'POST':
-        if request.user.favorites.filter(recipe=recipe).exists():
+        recipe = get_object_or_404(Recipe, pk=id)
+        if not add_relation(Favorite, user=request.user, recipe=recipe):
             return Response({'error':
                              'Рецепт уже добавлен в избранное'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        Favorite.objects.create(user=request.user, recipe=recipe)
         serializer = RecipeShortLinkSerializer(recipe,
                                                context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    favorite = request.user.favorites.filter(recipe=recipe)
-    if favorite.exists():
-        favorite.delete()
+    if remove_relation(Favorite, user=request.user, recipe_id=id):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    get_object_or_404(Recipe, pk=id)
     return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -271,13 +336,10 @@ def ingredients_list(request):
     name = request.query_params.get('name')
 
     if name:
-        ingredients = Ingredients.objects.filter(name__istartswith=name)
-    else:
-        ingredients = Ingredients.objects.all()
-
-    serializer = IngredientSerializer(ingredients, many=True)
+        return Response(ingredient_index.search(name),
+                        status=status.HTTP_200_OK)
 
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return catalogue_response(request)
 
 
 @api_view(['GET'])
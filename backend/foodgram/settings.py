@@ -89,10 +89,25 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS',
+                                        'False') == 'True',
     }
 }
 
+if os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'max_lifetime': int(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+            'max_idle': int(os.getenv('DB_POOL_MAX_IDLE', 600)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        },
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,6 +147,33 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', 'False') == 'True'
+
+INSTRUMENTATION = os.getenv('INSTRUMENTATION', 'False') == 'True'
+INSTRUMENTATION_N_PLUS_ONE = int(os.getenv('INSTRUMENTATION_N_PLUS_ONE', 10))
+if INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'api.instrumentation.InstrumentationMiddleware')
+
+RESPONSE_CACHE_BACKEND = os.getenv(
+    'RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': RESPONSE_CACHE_BACKEND,
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300)),
+    },
+}
+if RESPONSE_CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['responses']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+    }
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
@@ -26,16 +26,14 @@ class Inlines(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
-        'name', 'author', 'favorite_count'
+        'name', 'author', 'favorites_count'
     )
     search_fields = (
         'name', 'author__username',
     )
     inlines = [Inlines]
     list_filter = ('cooking_time',)
-
-    def favorite_count(self, obj):
-        return obj.favorited_by.count()
+    list_select_related = ('author',)
 
 
 @admin.register(Ingredients)
@@ -0,0 +1,41 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import User
+from .models import Favorite, Recipe, ShoppingCart, Subscription
+
+
+COUNTERS = (
+    (Favorite, Recipe, 'recipe', 'favorites_count'),
+    (ShoppingCart, Recipe, 'recipe', 'shopping_carts_count'),
+    (Recipe, User, 'author', 'recipes_count'),
+    (Subscription, User, 'author', 'subscribers_count'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(source, relation):
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{relation: OuterRef('pk')})
+            .order_by()
+            .values(relation)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def recount(source, target, relation, field):
+    actual = actual_count(source, relation)
+    stale = (target.objects.annotate(actual=actual)
+             .exclude(**{field: F('actual')}))
+    return target.objects.filter(pk__in=stale.values('pk')).update(
+        **{field: actual})
@@ -1,46 +1,198 @@
 import csv
+import json
 import os
-from django.core.management.base import BaseCommand
+import re
+import time
+from concurrent.futures import (ALL_COMPLETED, FIRST_COMPLETED,
+                                ThreadPoolExecutor, wait)
 
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from api.ingredient_index import invalidate_ingredients
 from recipe.models import Ingredients
-from foodgram import settings
-from typing import List
 
 
-ingredients_to_create: List[Ingredients] = []
-existing_names = set(Ingredients.objects.values_list('name', flat=True))
+JSON_BLOCK_SIZE = 1 << 16
+JSON_MAX_BLOCKS = 16
+JSON_SEPARATOR = re.compile(r'\s*,?\s*')
+NAME_LENGTH = Ingredients._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredients._meta.get_field('measurement_unit').max_length
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield get_fields(json.loads(line))
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_BLOCK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError("Ожидается JSON-массив ингредиентов")
+    index, blocks = 1, 0
+    while True:
+        index = JSON_SEPARATOR.match(buffer, index).end()
+        if buffer.startswith(']', index):
+            return
+        try:
+            item, index = decoder.raw_decode(buffer, index)
+        except json.JSONDecodeError:
+            block = file.read(JSON_BLOCK_SIZE)
+            if not block or blocks >= JSON_MAX_BLOCKS:
+                raise CommandError("Некорректный JSON")
+            buffer, index = buffer[index:] + block, 0
+            blocks += 1
+            continue
+        blocks = 0
+        yield get_fields(item)
+
+
+def get_fields(item):
+    if not isinstance(item, dict):
+        raise CommandError(f"Некорректная запись: {item!r}")
+    return item.get('name'), item.get('measurement_unit')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'jsonl': read_jsonl,
+}
+
+
+def read_chunks(rows, chunk_size):
+    chunk, read, skipped = {}, 0, 0
+    for name, unit in rows:
+        read += 1
+        name, unit = str(name or '').strip(), str(unit or '').strip()
+        if (not name or not unit or len(name) > NAME_LENGTH
+                or len(unit) > UNIT_LENGTH):
+            skipped += 1
+            continue
+        chunk[name, unit] = None
+        if len(chunk) >= chunk_size:
+            yield chunk, read, skipped
+            chunk, read, skipped = {}, 0, 0
+    if read:
+        yield chunk, read, skipped
+
+
+def load_chunk(chunk, dry_run):
+    if dry_run:
+        existing = set(
+            Ingredients.objects.filter(name__in={name for name, _ in chunk})
+            .values_list('name', 'measurement_unit'))
+        return len(chunk.keys() - existing)
+    Ingredients.objects.bulk_create(
+        [Ingredients(name=name, measurement_unit=unit)
+         for name, unit in chunk],
+        ignore_conflicts=True,
+    )
+    return None
+
+
+def load_chunk_in_thread(chunk, dry_run):
+    try:
+        return load_chunk(chunk, dry_run)
+    finally:
+        connections.close_all()
 
 
 class Command(BaseCommand):
     help = "Загрузка данных об ингредиентах в базу данных"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help="Файл CSV, JSON или JSONL")
+        parser.add_argument('--format', choices=READERS,
+                            help="Формат файла, по умолчанию по расширению")
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Число потоков для параллельной загрузки")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Проверить файл без записи в базу")
+
     def handle(self, *args, **options):
-        path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
-
-        with open(path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)
-
-            for row in reader:
-                if len(row) < 2:
-                    continue
-
-                name = row[0].strip()
-                unit = row[1].strip()
-
-                if name and unit and name not in existing_names:
-                    ingredients_to_create.append(
-                        Ingredients(name=name, measurement_unit=unit))
-                    existing_names.add(name)
-
-        if ingredients_to_create:
-            Ingredients.objects.bulk_create(
-                ingredients_to_create,
-                batch_size=1000
-            )
-
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Успешно загружено {len(ingredients_to_create)} ингредиентов"
-            )
-        )
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f"Неподдерживаемый формат файла: {path}")
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunk-size и --workers должны быть больше 0")
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write(self.style.WARNING(
+                "SQLite не поддерживает параллельную запись, "
+                "загрузка в один поток"))
+            workers = 1
+
+        self.verbosity = options['verbosity']
+        self.dry_run = options['dry_run']
+        self.rows = self.skipped = self.new = 0
+        self.started = time.perf_counter()
+        before = None if self.dry_run else Ingredients.objects.count()
+
+        try:
+            with open(path, encoding=options['encoding'], newline='') as file:
+                chunks = read_chunks(READERS[file_format](file),
+                                     options['chunk_size'])
+                if workers == 1:
+                    for chunk, read, skipped in chunks:
+                        self.report(read, skipped,
+                                    load_chunk(chunk, self.dry_run))
+                else:
+                    self.load_parallel(chunks, workers)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError) as error:
+            raise CommandError(f"Не удалось прочитать {path}: {error}")
+
+        elapsed = time.perf_counter() - self.started
+        if self.dry_run:
+            summary = f"Будет загружено не более {self.new} ингредиентов"
+        else:
+            self.new = Ingredients.objects.count() - before
+            invalidate_ingredients()
+            summary = f"Успешно загружено {self.new} ингредиентов"
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary}, обработано строк: {self.rows}, пропущено: "
+            f"{self.skipped}, {self.rows / max(elapsed, 1e-9):.0f} строк/с"))
+
+    def load_parallel(self, chunks, workers):
+        with ThreadPoolExecutor(workers) as executor:
+            pending = {}
+            for chunk, read, skipped in chunks:
+                if len(pending) >= workers * 2:
+                    self.collect(pending, FIRST_COMPLETED)
+                future = executor.submit(load_chunk_in_thread, chunk,
+                                         self.dry_run)
+                pending[future] = (read, skipped)
+            self.collect(pending)
+
+    def collect(self, pending, return_when=ALL_COMPLETED):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            read, skipped = pending.pop(future)
+            self.report(read, skipped, future.result())
+
+    def report(self, read, skipped, new):
+        self.rows += read
+        self.skipped += skipped
+        self.new += new or 0
+        if self.verbosity > 1:
+            elapsed = time.perf_counter() - self.started
+            self.stdout.write(
+                f"Обработано строк: {self.rows}, "
+                f"{self.rows / max(elapsed, 1e-9):.0f} строк/с")
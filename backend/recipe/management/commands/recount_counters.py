@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = "Пересчёт счётчиков избранного, корзин, рецептов и подписчиков"
+
+    def handle(self, *args, **options):
+        for source, target, relation, field in COUNTERS:
+            with transaction.atomic():
+                fixed = recount(source, target, relation, field)
+            self.stdout.write(
+                f"{target.__name__}.{field}: исправлено записей {fixed}")
+
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны"))
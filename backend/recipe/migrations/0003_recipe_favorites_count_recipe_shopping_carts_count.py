@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+COUNTERS = (
+    ('recipe.Favorite', 'recipe.Recipe', 'recipe', 'favorites_count'),
+    ('recipe.ShoppingCart', 'recipe.Recipe', 'recipe',
+     'shopping_carts_count'),
+    ('recipe.Recipe', settings.AUTH_USER_MODEL, 'author', 'recipes_count'),
+    ('recipe.Subscription', settings.AUTH_USER_MODEL, 'author',
+     'subscribers_count'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for source_name, target_name, relation, field in COUNTERS:
+        source = apps.get_model(source_name)
+        target = apps.get_model(target_name)
+        target.objects.update(**{field: Coalesce(
+            Subquery(
+                source.objects.filter(**{relation: OuterRef('pk')})
+                .order_by()
+                .values(relation)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            0,
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0002_initial'),
+        ('users', '0002_user_recipes_count_user_subscribers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
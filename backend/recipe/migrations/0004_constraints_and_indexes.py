@@ -0,0 +1,65 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+INGREDIENT_NAME_INDEX = 'recipe_ingredients_name_upper_idx'
+
+
+def remove_duplicates(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipe', 'ShoppingCart')
+    duplicates = (ShoppingCart.objects.values('user', 'recipe')
+                  .annotate(total=Count('id'), keep=Max('id'))
+                  .filter(total__gt=1))
+    for row in duplicates:
+        ShoppingCart.objects.filter(
+            user=row['user'], recipe=row['recipe'],
+        ).exclude(id=row['keep']).delete()
+
+    RecipeIngredient = apps.get_model('recipe', 'RecipeIngredient')
+    duplicates = (RecipeIngredient.objects.values('recipe', 'ingredient')
+                  .annotate(total=Count('id'), keep=Max('id'),
+                            amount=Sum('amount'))
+                  .filter(total__gt=1))
+    for row in duplicates:
+        lines = RecipeIngredient.objects.filter(
+            recipe=row['recipe'], ingredient=row['ingredient'])
+        lines.exclude(id=row['keep']).delete()
+        lines.update(amount=min(row['amount'], 32000))
+
+
+def create_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INGREDIENT_NAME_INDEX} '
+            'ON recipe_ingredients (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def drop_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {INGREDIENT_NAME_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0003_recipe_favorites_count_recipe_shopping_carts_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'id'], name='recipe_author_id_idx'),
+        ),
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
@@ -0,0 +1,17 @@
+import foodgram.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_constraints_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=foodgram.storage.ContentAddressedStorage(), upload_to='recipes/', verbose_name='Изображение блюда'),
+        ),
+    ]
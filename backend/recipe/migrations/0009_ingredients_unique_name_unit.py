@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredients = apps.get_model('recipe', 'Ingredients')
+    RecipeIngredient = apps.get_model('recipe', 'RecipeIngredient')
+    duplicates = (Ingredients.objects.values('name', 'measurement_unit')
+                  .annotate(total=Count('id'))
+                  .filter(total__gt=1))
+    for row in duplicates:
+        ids = list(Ingredients.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit'],
+        ).order_by('id').values_list('id', flat=True))
+        kept, removed = {}, []
+        for line in RecipeIngredient.objects.filter(
+                ingredient_id__in=ids).order_by('ingredient_id', 'id'):
+            if line.recipe_id in kept:
+                kept_line = kept[line.recipe_id]
+                kept_line.amount = min(kept_line.amount + line.amount, 32000)
+                removed.append(line.id)
+            else:
+                line.ingredient_id = ids[0]
+                kept[line.recipe_id] = line
+        RecipeIngredient.objects.filter(id__in=removed).delete()
+        RecipeIngredient.objects.bulk_update(kept.values(),
+                                             ['ingredient', 'amount'])
+        Ingredients.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredients',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
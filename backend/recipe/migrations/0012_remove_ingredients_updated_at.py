@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_recipe_search_triggers'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ingredients',
+            name='updated_at',
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.core.validators import MinValueValidator, MaxValueValidator
-from users.models import User
+from foodgram.storage import ContentAddressedStorage
+from users.models import CountersMixin, User
 
 
 MIN_VALUE_VALIDATE = 1
@@ -18,12 +20,42 @@ class Ingredients(models.Model):
     class Meta:
         verbose_name = 'ингредиент'
         verbose_name_plural = 'ингредиенты'
+        constraints = [
+            models.UniqueConstraint(fields=('name', 'measurement_unit'),
+                                    name='unique_ingredient_name_unit'),
+        ]
 
     def __str__(self):
         return f'{self.name}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_ingredients(self):
+        return self.select_related('author').prefetch_related(
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            )
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                is_author_subscribed=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_author_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User, verbose_name='Автор публикации',
         on_delete=models.CASCADE, related_name='recipes', default=1,
@@ -34,6 +66,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение блюда',
         upload_to='recipes/', null=True, blank=True,
+        storage=ContentAddressedStorage(),
     )
     text = models.TextField(
         verbose_name='Описание', max_length=200,
@@ -46,10 +79,30 @@ class Recipe(models.Model):
             MinValueValidator(MIN_VALUE_VALIDATE),
             MaxValueValidator(MAX_VALUE_VALIDATE),],
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном', default=0, editable=False,
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        verbose_name='В корзинах', default=0, editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'shopping_carts_count')
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
+        indexes = [
+            models.Index(fields=('author', 'id'),
+                         name='recipe_author_id_idx'),
+            models.Index(fields=('cooking_time',),
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=('updated_at',),
+                         name='recipe_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name}'
@@ -72,6 +125,10 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'ингредиент в рецепте'
         verbose_name_plural = 'ингредиенты в рецептах'
+        constraints = [
+            models.UniqueConstraint(fields=('recipe', 'ingredient'),
+                                    name='unique_recipe_ingredient'),
+        ]
 
     def __str__(self):
         return f'Рецепт {self.recipe} содержит {self.ingredient}'
@@ -133,6 +190,10 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_shopping_cart'),
+        ]
 
     def __str__(self):
         return f'{self.recipe}'
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import COUNTERS, change_counter
+from .models import Ingredients, Recipe, RecipeIngredient
+
+
+def connect_counter(source, target, relation, field):
+    def increment(sender, instance, created, **kwargs):
+        if created:
+            change_counter(target, getattr(instance, f'{relation}_id'),
+                           field, 1)
+
+    def decrement(sender, instance, **kwargs):
+        change_counter(target, getattr(instance, f'{relation}_id'),
+                       field, -1)
+
+    uid = f'{source.__name__}.{field}'
+    post_save.connect(increment, sender=source, weak=False,
+                      dispatch_uid=f'{uid}.increment')
+    post_delete.connect(decrement, sender=source, weak=False,
+                        dispatch_uid=f'{uid}.decrement')
+
+
+for counter in COUNTERS:
+    connect_counter(*counter)
+
+
+def touch_recipe(recipe_id):
+    Recipe.objects.filter(pk=recipe_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def touch_ingredient_recipe(sender, instance, **kwargs):
+    touch_recipe(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(pre_delete, sender=Ingredients)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(recipe_ingredient__ingredient=instance).update(
+            updated_at=timezone.now())
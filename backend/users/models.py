@@ -2,9 +2,24 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 
+from foodgram.storage import ContentAddressedStorage
+
+
+class CountersMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
 
 # Create your models here.
-class User(AbstractUser):
+class User(CountersMixin, AbstractUser):
     email = models.EmailField(
         verbose_name='Электронная почта',
         max_length=254,
@@ -31,13 +46,29 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='users/images/',
+        storage=ContentAddressedStorage(),
         null=True,
         blank=True,
         verbose_name='Аватар',
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'subscribers_count')
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -10,6 +10,7 @@ const Card = ({
   name = "Без названия",
   id,
   image,
+  image_medium,
   is_favorited,
   is_in_shopping_cart,
   cooking_time,
@@ -44,7 +45,7 @@ const Card = ({
         title={
           <div
             className={styles.card__image}
-            style={{ backgroundImage: `url(${image})` }}
+            style={{ backgroundImage: `url(${image_medium || image})` }}
           />
         }
       />
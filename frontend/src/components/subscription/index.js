@@ -75,7 +75,7 @@ const Subscription = ({
                   title={
                     <div className={styles.subscriptionRecipe}>
                       <img
-                        src={recipe.image}
+                        src={recipe.image_thumbnail || recipe.image}
                         alt={recipe.name}
                         className={styles.subscriptionRecipeImage}
                       />